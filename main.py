@@ -8,6 +8,11 @@ if __name__ == '__main__':
         pass
 
     # methodutil.config.DEFAULT_MODULE_PATH = "unitauto"
+    # methodutil.config.CATALOG_PATH = "unitauto_catalog.json"
+    # methodutil.config.RELOAD_PATHS = ["unitauto/test"]
+    # methodutil.config.LIST_WORKERS = 8
+    # methodutil.config.INVOKE_WORKERS = 4
+    # methodutil.config.WARMUP = [{"package": "unitauto.test", "class": "testutil"}]
     # methodutil.listener.callback = callback
 
     test()
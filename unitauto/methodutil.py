@@ -21,15 +21,31 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import ast
 import asyncio
 import builtins
+import collections
+import collections.abc
+import concurrent.futures
+import dataclasses
+import enum
+import importlib
+import io
+import itertools
 import json
+import multiprocessing
 import os
+import pickle
+import queue
 import re
+import sys
+import textwrap
+import threading
 import time
 import inspect
 import types
 import typing
+import weakref
 from typing import Type
 
 null = None
@@ -73,6 +89,7 @@ KEY_METHOD = "method"
 KEY_MOCK = "mock"
 KEY_QUERY = "query"
 KEY_DEPTH = "depth"
+KEY_STREAM = "stream"
 KEY_RETURN = "return"
 KEY_TIME_DETAIL = "time:start|duration|end"
 KEY_CLASS_ARGS = "classArgs"
@@ -80,15 +97,33 @@ KEY_METHOD_ARGS = "methodArgs"
 KEY_ARGS = "args"
 KEY_CALLBACK = "callback"
 KEY_GLOBAL = "global"
+KEY_LIST = "list"
+KEY_CONCURRENCY = "concurrency"
+KEY_LIMIT = "limit"
+KEY_COUNT = "count"
+KEY_TRUNCATED = "truncated"
 
 KEY_CALL_LIST = "call()[]"
 KEY_CALL_MAP = "call(){}"
+KEY_CALL_COUNT = "callCount"
 KEY_PACKAGE_TOTAL = "packageTotal"
 KEY_CLASS_TOTAL = "classTotal"
 KEY_METHOD_TOTAL = "methodTotal"
+KEY_PACKAGE_OFFSET = "packageOffset"
+KEY_CLASS_OFFSET = "classOffset"
+KEY_METHOD_OFFSET = "methodOffset"
+KEY_PACKAGE_LIMIT = "packageLimit"
+KEY_CLASS_LIMIT = "classLimit"
+KEY_METHOD_LIMIT = "methodLimit"
+KEY_PACKAGE_PREFIX = "packagePrefix"
+KEY_CLASS_PREFIX = "classPrefix"
+KEY_METHOD_PREFIX = "methodPrefix"
 KEY_PACKAGE_LIST = "packageList"
 KEY_CLASS_LIST = "classList"
 KEY_METHOD_LIST = "methodList"
+KEY_ERROR_LIST = "errorList"
+KEY_FILE = "file"
+KEY_WORKERS = "workers"
 
 MILLIS_TIME = 1000000
 
@@ -101,6 +136,28 @@ PATTERN_NAME = re.compile('^[A-Za-z0-9_]+$')
 
 class Config:
     DEFAULT_MODULE_PATH: str = ''
+    CATALOG_PATH: str = ''  # e.g. 'unitauto_catalog.json', cache list_method results of unchanged files
+    LIST_WORKERS: int = 0  # e.g. 8, import and parse modules of list_method in this number of processes
+    LIST_TIMEOUT: float = 60  # seconds to wait for modules parsed in processes of LIST_WORKERS
+    INVOKE_WORKERS: int = 0  # e.g. 4, invoke methods in this number of pre-forked processes instead of the server
+    WORKER_GRACE: float = 1  # extra seconds to wait for the timeout response of a worker before killing it
+    WORKER_MODULES: list = []  # e.g. ['unitauto.test.testutil'], modules imported by every worker process on start
+    BATCH_CONCURRENCY: int = 8  # max count of requests of invoke_batch invoked at the same time
+    BATCH_TIMEOUT: float = 60  # seconds to wait for every request of invoke_batch without timeout, 0 for no limit
+    ITERATOR_LIMIT: int = 10000  # max count of items of generator, iterator, map, range results, 0 for no limit
+    ENCODE_DEPTH: int = 32  # max depth of nested objects encoded by encode_value, deeper ones are encoded by str
+    PLAN_CACHE_SIZE: int = 10000  # max count of cached InvokePlan of package, class, method and import_fun
+    TYPE_CACHE_SIZE: int = 10000  # max count of cached results of get_type_str_by_str and is_module_path
+    CLASS_CACHE_SIZE: int = 10000  # max count of classes resolved by get_class, not counting preload_classes
+    CODE_CACHE_SIZE: int = 1000  # max count of cached code objects compiled from callback returns and scripts
+    CALL_LIST_LIMIT: int = 1000  # max count of records in call()[] of every callback, 0 for no limit
+    INSTANCE_CACHE_SIZE: int = 1000  # max count of instances kept for reuse: true, 0 for no limit
+    INSTANCE_TTL: float = 0  # e.g. 3600, seconds since the last use to evict a reused instance, 0 for never
+    INSTANCE_MEMORY: int = 0  # e.g. 512 * 1024 * 1024, max total bytes of reused instances by sys.getsizeof, 0 for no limit
+    WARMUP: list = []  # e.g. [{'package': 'unitauto.test', 'class': 'testutil', 'method': ['add'], 'reuse': True}]
+    COVERAGE_REPORT_INTERVAL: float = 5  # seconds to reuse a /coverage/report while coverage is running
+    RELOAD_PATHS: list = []  # e.g. ['unitauto/test'], reload changed modules under these paths while running
+    RELOAD_INTERVAL: float = 1  # seconds between two checks of RELOAD_PATHS
 
 
 config = Config()
@@ -163,7 +220,110 @@ class InterfaceProxy:
     pass
 
 
-INSTANCE_MAP = {}
+class InstanceEntry:
+    key: str = null
+    instance: any = null
+    size: int = 0
+    hit: int = 0
+    create_time: float = 0
+    access_time: float = 0
+
+    def __init__(self, key: str, instance, size: int = 0):
+        self.key = key
+        self.instance = instance
+        self.size = size
+        self.create_time = self.access_time = time.time()
+
+    def to_dict(self) -> dict:
+        return {
+            KEY_KEY: self.key,
+            KEY_TYPE: type(self.instance).__name__,
+            'hit': self.hit,
+            'size': self.size,
+            'createTime': round(self.create_time * 1000),
+            'accessTime': round(self.access_time * 1000)
+        }
+
+
+class InstanceCache(collections.OrderedDict):  # key: InstanceEntry, from the least recently used to the most
+    def __init__(self):
+        super().__init__()
+        self.lock = threading.RLock()
+        self.memory = 0
+        self.stats = {
+            'hit': 0,
+            'miss': 0,
+            'evict': 0
+        }
+
+    def get(self, key: str, default=null):
+        with self.lock:
+            entry = super().get(key)
+            if entry is not None and 0 < config.INSTANCE_TTL < time.time() - entry.access_time:
+                self.pop_entry(key)
+                entry = null
+
+            if entry is None:
+                self.stats['miss'] += 1
+                return default
+
+            self.move_to_end(key)
+            entry.hit += 1
+            entry.access_time = time.time()
+            self.stats['hit'] += 1
+            return entry.instance
+
+    def put(self, key: str, instance):
+        with self.lock:
+            entry = super().get(key)
+            if entry is not None:  # built by another thread at the same time, reuse that one
+                return entry.instance
+
+            # shallow size, fields referred by __dict__ are not counted
+            size = sys.getsizeof(instance) + sys.getsizeof(getattr(instance, '__dict__', null) or {})
+            self[key] = InstanceEntry(key, instance, size)
+            self.memory += size
+
+            now = time.time()
+            for k, e in list(self.items()):
+                if k == key:
+                    break
+                expired = 0 < config.INSTANCE_TTL < now - e.access_time
+                if not (expired or 0 < config.INSTANCE_CACHE_SIZE < len(self)
+                        or 0 < config.INSTANCE_MEMORY < self.memory):
+                    break
+                self.pop_entry(k)
+
+            return instance
+
+    def pop_entry(self, key: str) -> InstanceEntry:
+        entry = self.pop(key, null)
+        if entry is not None:
+            self.memory -= entry.size
+            self.stats['evict'] += 1
+        return entry
+
+    def evict(self, fun: callable = null) -> list:
+        with self.lock:
+            keys = [k for k, e in self.items() if fun is None or fun(e)]
+            for k in keys:
+                self.pop_entry(k)
+            return keys
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return dict(self.stats, count=len(self), memory=self.memory)
+
+
+INSTANCE_MAP = InstanceCache()
+
+
+def get_instance_key(clazz, constructor: callable = null, class_args: list = null) -> str:
+    key = str(getattr(clazz, '__module__', '')) + '.' + str(getattr(clazz, '__qualname__', clazz))
+    if constructor is not None:
+        key += '.' + str(getattr(constructor, '__name__', constructor))
+    args = json.dumps(class_args, ensure_ascii=false, sort_keys=true, separators=(',', ':'), default=str)
+    return key + '(' + args + ')'
 
 
 def get_instance(
@@ -171,10 +331,9 @@ def get_instance(
     reuse: bool = false, module=null, import_fun: callable = null, ctx: dict = null
 ):
     reuse = reuse or false
-    key = str(clazz) + ('' if is_none(constructor) else '.' + str(constructor))\
-        + '(' + str(class_args) + ')' if reuse else null
+    key = get_instance_key(clazz, constructor, class_args) if reuse else null
 
-    instance = INSTANCE_MAP[key] if reuse else null
+    instance = INSTANCE_MAP.get(key) if reuse else null
 
     if is_none(instance):
         cal = size(class_args)
@@ -200,11 +359,117 @@ def get_instance(
                     )
 
         if reuse and not_none(instance):
-            INSTANCE_MAP[key] = instance
+            instance = INSTANCE_MAP.put(key, instance)
 
     return instance
 
 
+class LruMap(collections.OrderedDict):
+    max_size: int = 0
+
+    def __init__(self, max_size: int = 0):
+        super().__init__()
+        self.max_size = max_size
+        self.lock = threading.RLock()
+
+    def get(self, key, default=null):
+        with self.lock:
+            if key not in self:
+                return default
+            self.move_to_end(key)
+            return self[key]
+
+    def put(self, key, value, max_size: int = null):
+        with self.lock:
+            self[key] = value
+            self.move_to_end(key)
+
+            max_size = self.max_size if max_size is None else max_size
+            while 0 < max_size < len(self):
+                self.popitem(last=false)
+
+
+class InvokePlan:
+    module: any = null
+    clazz: any = null
+    func: callable = null
+    constructor: callable = null
+
+    def __init__(self, module=null, clazz=null, func: callable = null, constructor: callable = null):
+        self.module = module
+        self.clazz = clazz
+        self.func = func
+        self.constructor = constructor
+
+
+PLAN_MAP = LruMap()  # bounded by Config.PLAN_CACHE_SIZE
+PLAN_LOCK = threading.Lock()  # for PLAN_STATS
+PLAN_STATS = {
+    'hit': 0,
+    'miss': 0
+}
+
+
+def get_plan(
+    package: str, clazz: str, method: str, constructor: str = null, static: bool = false, import_fun: callable = null
+) -> InvokePlan:
+    import_fun = import_fun or __import__
+    key = (package, clazz, method, constructor, static or false, import_fun)  # a custom importer may resolve others
+    plan = PLAN_MAP.get(key)
+    if not_none(plan):
+        with PLAN_LOCK:
+            PLAN_STATS['hit'] += 1
+        return plan
+
+    fl = split(clazz, '$')
+    l = size(fl)
+
+    mn = package if l <= 0 else package + '.' + fl[0]
+    module = import_fun(mn, fromlist=['__init__'] if l <= 0 else fl[0])
+
+    cls: any = null
+    if l > 1:
+        i = -1
+        m = module
+        for n in fl:
+            i += 1
+            if i <= 0:
+                continue
+            m = getattr(m, n)
+
+        cls = m
+        # 'testutil' object has no attribute 'Test.InnerTest'  cls = getattr(module, '.'.join(fl[1:]))
+
+    func = null
+    constructor_func = null
+    if cls is None:
+        func = getattr(module, method)
+    elif static:
+        func = getattr(cls, method)
+    elif not_empty(constructor):
+        constructor_func = getattr(module, constructor)
+
+    plan = InvokePlan(module, cls, func, constructor_func)
+    with PLAN_LOCK:
+        PLAN_STATS['miss'] += 1
+    PLAN_MAP.put(key, plan, config.PLAN_CACHE_SIZE)
+
+    return plan
+
+
+def clear_plan(package: str = null, clazz: str = null) -> int:
+    with PLAN_MAP.lock:
+        keys = [k for k in PLAN_MAP if (package is None or k[0] == package) and (clazz is None or k[1] == clazz)]
+        for k in keys:
+            del PLAN_MAP[k]
+    return size(keys)
+
+
+def get_plan_stats() -> dict:
+    with PLAN_LOCK:
+        return dict(PLAN_STATS, size=size(PLAN_MAP))
+
+
 def on_complete(data: any, method: callable, proxy: InterfaceProxy, *extras: any):
     pass
 
@@ -222,7 +487,7 @@ class Listener:
 listener = Listener()
 
 
-def list_method(req, import_fun: callable = null) -> dict:
+def list_method(req, import_fun: callable = null, item_callback: callable = null) -> dict:
     start_time = cur_time_in_millis()
     try:
         if is_str(req):
@@ -249,6 +514,23 @@ def list_method(req, import_fun: callable = null) -> dict:
         types = req.get('types')
         assert is_list(types), 'types must be list!'
 
+        stream = req.get(KEY_STREAM)
+        assert is_bool(stream), KEY_STREAM + ' must be bool!'
+
+        pages = {}
+        for k in (KEY_PACKAGE_OFFSET, KEY_CLASS_OFFSET, KEY_METHOD_OFFSET, KEY_PACKAGE_LIMIT, KEY_CLASS_LIMIT, KEY_METHOD_LIMIT):
+            v = req.get(k)
+            assert is_int(v) and (v is None or v >= 0), k + ' must be int and >= 0!'
+            pages[k] = v or 0
+
+        prefixes = {}
+        for k in (KEY_PACKAGE_PREFIX, KEY_CLASS_PREFIX, KEY_METHOD_PREFIX):
+            v = req.get(k)
+            assert is_str(v), k + ' must be str!'
+            prefixes[k] = v
+
+        is_data = query in [null, 0, 2]
+
         is_all_pkg = is_empty(package)
         is_all_cls = is_empty(clazz)
         is_all_mtd = is_empty(method)
@@ -258,6 +540,14 @@ def list_method(req, import_fun: callable = null) -> dict:
         module_list = []
         import_fun = import_fun or __import__
 
+        catalog = load_catalog() if is_all_cls and is_all_mtd else null
+        is_changed = false
+        stat_map = {}  # file: stat of dependencies checked in this call
+
+        workers = config.LIST_WORKERS or 0
+        is_scan = workers > 1 and is_picklable(import_fun)  # import_fun is sent to processes of LIST_WORKERS
+        tasks = []
+
         depth = depth or 0
         d = 0
         for root, dirs, files in os.walk(package.replace('.', '/')):
@@ -274,14 +564,61 @@ def list_method(req, import_fun: callable = null) -> dict:
                 if size(name) <= 3 or not name.endswith('.py'):
                     continue
 
+                file = os.path.abspath(os.path.join(root, name))
+                stat = get_file_stat(file) if not_none(catalog) else null
+                if not_none(stat):
+                    item = catalog.get(file)
+                    if is_dict(item, true) and item.get('stat') == stat and is_deps_unchanged(item.get('deps'), stat_map):
+                        module_list.append(item.get(KEY_VALUE) or {})
+                        continue
+
                 name = name[:-3]
                 p = os.path.join(root, name).replace('/', '.')
+                if is_scan:
+                    tasks.append([size(module_list), file, p, stat])
+                    module_list.append({})
+                    continue
+
                 m = import_fun(p, fromlist=name)
-                if is_none(m) or module_list.__contains__(m) or m in module_list:
+                if is_none(m) or m in module_list:
                     continue
 
+                if not_none(stat):
+                    deps = get_module_deps(m)
+                    m = parse_module(m, import_fun=import_fun) or {}
+                    with CATALOG_LOCK:
+                        catalog[file] = {
+                            'stat': stat,
+                            'deps': deps,
+                            KEY_VALUE: m
+                        }
+                    is_changed = true
+
                 module_list.append(m)
 
+        error_list = []
+        if not_empty(tasks):
+            results = scan_modules(
+                [t[2] for t in tasks], workers, config.LIST_TIMEOUT, fl, method, is_all_cls, is_all_mtd, import_fun
+            )
+            for t, r in zip(tasks, results):
+                if is_none(r.get(KEY_THROW)):
+                    module_list[t[0]] = r.get(KEY_VALUE) or {}
+                    if not_none(t[3]):
+                        with CATALOG_LOCK:
+                            catalog[t[1]] = {
+                                'stat': t[3],
+                                'deps': r.get('deps') or {},
+                                KEY_VALUE: module_list[t[0]]
+                            }
+                        is_changed = true
+                else:
+                    r[KEY_FILE] = t[1]
+                    error_list.append(r)
+
+        if is_changed:
+            save_catalog()
+
         if is_empty(module_list):
             try:
                 mn = package if is_empty(fl) else package + '.' + fl[0]
@@ -299,166 +636,39 @@ def list_method(req, import_fun: callable = null) -> dict:
                 print(e)
 
         pkg_list = []
+        pkg_total = 0
+        cls_total = 0
+        mtd_total = 0
 
-        for module_item in module_list:
-            cl = []
-            pkg = module_item.__name__
-            pkg_str = str(module_item)
-            is_file = pkg_str.endswith(".py'>") and not pkg_str.endswith("/__init__.py'>")
-            file_name = null
-
-            if is_file:
-                ns = split(pkg, '.')  # 不存在这个函数 ind = last_index(pkg, '.')
-                file_name = ns[-1]
-                pkg = pkg[:-1-len(ns[-1])]
-                # module_item = import_fun(pkg)
-                # if module_item not in cl and not cl.__contains__(module_item):
-                cl.append(module_item)
-
-            if pkg.endswith('.__init__'):
-                pkg = pkg[:-len('.__init__')]
-
-            if is_empty(pkg):
-                continue
-
-            mdl_list = dir(module_item)
-            l = size(mdl_list)
+        pkg_offset = pages[KEY_PACKAGE_OFFSET]
+        pkg_limit = pages[KEY_PACKAGE_LIMIT]
+        pkg_prefix = prefixes[KEY_PACKAGE_PREFIX]
 
-            cls_list = []
-
-            if l > 1 and not is_all_cls:
-                try:
-                    cls = module_item
-                    i = -1
-                    for n in fl:
-                        i += 1
-                        if i <= 0:
-                            continue
-                        cls = getattr(cls, n)
-                    cl = [cls]
-                except Exception as e:
-                    print(e)
-            else:
-                for mdl in mdl_list:
-                    pn = str(mdl)
-                    if is_empty(pn) or pn.startswith('_') or pn.endswith('_'):
-                        continue
-                    try:
-                        cls = getattr(module_item, pn)
-                        cm = cls.__module__ if hasattr(cls, '__module__') else null
-                        if is_empty(cm) or not cm.startswith(pkg):
-                            continue
-
-                        ct = type(cls).__name__
-                        s = str(cls)
-                        if ct == 'function':
-                            if is_file:
-                                continue
-
-                            mtd = parse_method(cls, import_fun=import_fun) if is_all_mtd or cls.__name__ == method else null
-                            if is_empty(mtd):
-                                continue
-
-                            cls_list.append({
-                                KEY_CLASS: file_name,
-                                KEY_METHOD_LIST: [mtd]
-                            })
-                        if ct == 'class' or ct == 'type':
-                            if cls not in cl and not cl.__contains__(cls):
-                                cl.append(cls)
-                        elif ct == 'module':
-                            if is_file or (s.endswith(".py'>") and not s.endswith("/__init__.py'>")):
-                                if cls not in cl and not cl.__contains__(cls):
-                                    cl.append(cls)
-                            # elif not (cls in module_list):
-                            #     module_list.append(cls)
-                    except Exception as e:
-                        print(e)
-
-            for cls in cl:
-                cn = cls.__name__
-
-                cs = str(cls).strip()  # 一样 cs = cls.__str__()
-                ind = index(cs, "'")
-                if ind >= 0:
-                    cs = cs[ind + 1:]
-
-                ind = index(cs, "'")
-                if ind >= 0:
-                    cs = cs[:ind]
-
-                if not cs.startswith(pkg + '.'):
-                    continue
-
-                cs = cs[len(pkg + '.'):]
-                if is_empty(cs):
-                    continue
-
-                if true:
-                    ml = []
-                    if callable(cls) and type(cls).__name__ == 'function':
-                        if is_all_mtd or cn == method:
-                            ml = [cls]
-                        else:
-                            continue
-                    elif not is_all_mtd:
-                        try:
-                            func = getattr(cls, method)
-                            if callable(func) and type(func).__name__ == 'function':
-                                ml = [func]
-                        except Exception as e:
-                            print(e)
-                    else:
-                        ns = dir(cls)
-                        if not_empty(ns):
-                            for n in ns:
-                                if is_empty(n) or n.startswith('_') or n.endswith('_'):
-                                    continue
-
-                                try:
-                                    func = getattr(cls, n)
-                                    if callable(func):
-                                        ft = type(func).__name__
-                                        if ft == 'function':
-                                            ml.append(func)
-                                        # elif ft in ('type', 'class') and str(func) == ("<class '" + cn + "." + func.__name__ + "'>"):
-                                        #     cl.append(func)
-                                except Exception as e:
-                                    print(e)
-                        # cls.__class__.methods
-
-                    mtd_list = []
-                    for mtd in ml:
-                        m = parse_method(mtd, import_fun=import_fun)
-                        if not_empty(m):
-                            mtd_list.append(m)
-
-                    # 不存在这个函数 ind = cn.lastindex('.')
-                    # <module 'unitauto.test.testutil' from 'unitauto/test/testutil.py'>
-                    # if cs.startswith("class <'"):
-                    #     cs = cs[len("class <'"):]
-                    # if cs.endswith("'>"):
-                    #     cs = cs[:-len("'>")]
-
-                    if is_empty(mtd_list):
-                        continue
+        for item in module_list:
+            pkg_item = item if is_dict(item, true) else parse_module(
+                item, fl, method, is_all_cls, is_all_mtd, import_fun=import_fun, is_parse=false
+            )
+            if is_empty(pkg_item) or (not_empty(pkg_prefix) and not pkg_item.get(KEY_PACKAGE).startswith(pkg_prefix)):
+                continue
 
-                    cls_list.append({
-                        # KEY_CLASS: cn if ind < 0 else cn[ind+1:],
-                        KEY_CLASS: cs.replace('.', '$'),
-                        KEY_METHOD_LIST: mtd_list
-                    })
+            is_page = is_data and pkg_total >= pkg_offset and (pkg_limit <= 0 or pkg_total < pkg_offset + pkg_limit)
+            pkg_item, ct, mt = query_module(pkg_item, pages, prefixes, is_page, import_fun=import_fun)
+            if ct <= 0:
+                continue
 
-            if is_empty(cls_list):
+            pkg_total += 1
+            cls_total += ct
+            mtd_total += mt
+            if is_empty(pkg_item):
                 continue
 
-            pkg_list.append({
-                KEY_PACKAGE: pkg,
-                KEY_CLASS_LIST: cls_list
-            })
+            if item_callback is None:
+                pkg_list.append(pkg_item)
+            else:
+                item_callback(pkg_item)  # send it right now instead of keeping all in pkg_list
 
         time_detail = get_time_detail(start_time)
-        return {
+        res = {
             KEY_LANGUAGE: LANGUAGE,
             KEY_OK: true,
             KEY_CODE: CODE_SUCCESS,
@@ -466,6 +676,15 @@ def list_method(req, import_fun: callable = null) -> dict:
             KEY_PACKAGE_LIST: pkg_list,
             KEY_TIME_DETAIL: time_detail
         }
+        if query in [1, 2]:
+            res[KEY_PACKAGE_TOTAL] = pkg_total
+            res[KEY_CLASS_TOTAL] = cls_total
+            res[KEY_METHOD_TOTAL] = mtd_total
+        if item_callback is not None or not is_data:
+            del res[KEY_PACKAGE_LIST]
+        if not_empty(error_list):
+            res[KEY_ERROR_LIST] = error_list
+        return res
     except Exception as e:
         return {
             KEY_LANGUAGE: LANGUAGE,
@@ -478,7 +697,460 @@ def list_method(req, import_fun: callable = null) -> dict:
         }
 
 
+def list_instance(req=null) -> dict:
+    start_time = cur_time_in_millis()
+    try:
+        req = (parse_json(req) if is_str(req, true) and not_empty(req.strip()) else req) or {}
+        prefix = req.get(KEY_KEY)
+        assert is_str(prefix), KEY_KEY + ' must be str!'
+
+        with INSTANCE_MAP.lock:
+            entries = [e.to_dict() for k, e in INSTANCE_MAP.items() if is_empty(prefix) or k.startswith(prefix)]
+
+        res = {
+            KEY_LANGUAGE: LANGUAGE,
+            KEY_OK: true,
+            KEY_CODE: CODE_SUCCESS,
+            KEY_MSG: MSG_SUCCESS,
+            KEY_LIST: entries,
+            KEY_TIME_DETAIL: get_time_detail(start_time)
+        }
+        res.update(INSTANCE_MAP.get_stats())
+
+        workers = invoke_workers('list_instance', req)
+        if workers is not None:
+            res[KEY_WORKERS] = workers
+        return res
+    except Exception as e:
+        return wrap_error(e, start_time)
+
+
+def evict_instance(req=null) -> dict:
+    start_time = cur_time_in_millis()
+    try:
+        req = (parse_json(req) if is_str(req, true) and not_empty(req.strip()) else req) or {}
+        prefix = req.get(KEY_KEY)
+        assert is_str(prefix), KEY_KEY + ' must be str!'
+
+        keys = INSTANCE_MAP.evict(null if is_empty(prefix) else lambda e: e.key.startswith(prefix))
+        res = {
+            KEY_LANGUAGE: LANGUAGE,
+            KEY_OK: true,
+            KEY_CODE: CODE_SUCCESS,
+            KEY_MSG: MSG_SUCCESS,
+            KEY_LIST: keys,
+            KEY_COUNT: size(keys),
+            KEY_TIME_DETAIL: get_time_detail(start_time)
+        }
+
+        workers = invoke_workers('evict_instance', req)
+        if workers is not None:
+            res[KEY_WORKERS] = workers
+        return res
+    except Exception as e:
+        return wrap_error(e, start_time)
+
+
+def get_method_name(mtd) -> str:
+    return mtd.get(KEY_NAME) if is_dict(mtd, true) else mtd.__name__
+
+
+def query_module(pkg_item: dict, pages: dict, prefixes: dict, is_data: bool = true, import_fun: callable = null) -> list:
+    cls_offset = pages.get(KEY_CLASS_OFFSET) or 0
+    cls_limit = pages.get(KEY_CLASS_LIMIT) or 0
+    mtd_offset = pages.get(KEY_METHOD_OFFSET) or 0
+    mtd_limit = pages.get(KEY_METHOD_LIMIT) or 0
+    cls_prefix = prefixes.get(KEY_CLASS_PREFIX)
+    mtd_prefix = prefixes.get(KEY_METHOD_PREFIX)
+
+    cls_list = []
+    cls_total = 0
+    mtd_total = 0
+    for c in pkg_item.get(KEY_CLASS_LIST) or []:
+        if not_empty(cls_prefix) and not (c.get(KEY_CLASS) or '').startswith(cls_prefix):
+            continue
+
+        ml = c.get(KEY_METHOD_LIST) or []
+        if not_empty(mtd_prefix):
+            ml = [m for m in ml if get_method_name(m).startswith(mtd_prefix)]
+        if is_empty(ml):
+            continue
+
+        cls_total += 1
+        mtd_total += size(ml)
+        if not is_data or cls_total <= cls_offset or (cls_limit > 0 and cls_total > cls_offset + cls_limit):
+            continue
+
+        mtd_list = []
+        for m in ml[mtd_offset:mtd_offset + mtd_limit if mtd_limit > 0 else null]:
+            m = m if is_dict(m, true) else parse_method(m, import_fun=import_fun)  # only parse methods in the page
+            if not_empty(m):
+                mtd_list.append(m)
+
+        if not_empty(mtd_list):
+            cls_list.append({
+                KEY_CLASS: c.get(KEY_CLASS),
+                KEY_METHOD_LIST: mtd_list
+            })
+
+    pkg = null if is_empty(cls_list) else {
+        KEY_PACKAGE: pkg_item.get(KEY_PACKAGE),
+        KEY_CLASS_LIST: cls_list
+    }
+    return [pkg, cls_total, mtd_total]
+
+
+def scan_module(
+    name: str, fl: list = null, method: str = null, is_all_cls: bool = true, is_all_mtd: bool = true,
+    import_fun: callable = null
+) -> dict:
+    m = (import_fun or __import__)(name, fromlist=split(name, '.')[-1])
+    return {
+        KEY_VALUE: parse_module(m, fl, method, is_all_cls, is_all_mtd, import_fun=import_fun) or {},
+        'deps': get_module_deps(m)
+    }
+
+
+def get_scan_context():
+    # children of fork copy locks held by other threads of the server, like reload and warmup, which may deadlock
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def scan_modules(
+    names: list, workers: int, timeout: float = null, fl: list = null, method: str = null,
+    is_all_cls: bool = true, is_all_mtd: bool = true, import_fun: callable = null
+) -> list:
+    results = [null] * size(names)
+    pool = get_scan_context().Pool(processes=workers)
+    try:
+        jobs = [
+            pool.apply_async(scan_module, (name, fl, method, is_all_cls, is_all_mtd, import_fun)) for name in names
+        ]
+
+        timeout_count = 0
+        for i, job in enumerate(jobs):
+            try:
+                # every file has its own timeout, unless all processes are stuck in files timed out before
+                results[i] = job.get(timeout if timeout_count < workers else 0)
+            except multiprocessing.TimeoutError:
+                timeout_count += 1
+                results[i] = {
+                    KEY_THROW: 'TimeoutError',
+                    KEY_MSG: names[i] + ' is not parsed in ' + str(timeout) + 's!'
+                }
+            except Exception as e:
+                results[i] = {
+                    KEY_THROW: e.__class__.__name__,
+                    KEY_MSG: str(e)
+                }
+
+    finally:
+        pool.terminate()  # also kills processes stuck in importing, otherwise they block exiting
+
+    return results
+
+
+CATALOG = {}
+CATALOG_LOCK = threading.Lock()
+CATALOG_VERSION = 2
+
+
+def get_file_stat(file: str) -> list:
+    try:
+        st = os.stat(file)
+        return [st.st_mtime_ns, st.st_size]
+    except Exception as e:
+        print(e)
+    return null
+
+
+def get_module_deps(module, root: str = null) -> dict:
+    # files of project modules used by module directly or indirectly, like re-exported classes and base classes,
+    # the parsed module may change with them even if its own file does not
+    root = os.path.abspath(root or os.getcwd())
+    file = getattr(module, '__file__', null)
+    file = null if is_empty(file) else os.path.abspath(file)
+
+    deps = {}
+    names = {getattr(module, '__name__', null)}
+    modules = [module]
+    while not_empty(modules):
+        m = modules.pop()
+        for v in list(vars(m).values()):
+            try:
+                if type(v).__name__ == 'module':
+                    dns = [v.__name__]
+                elif is_instance(v, type):
+                    dns = [getattr(c, '__module__', null) for c in v.__mro__]
+                else:
+                    dns = [getattr(v, '__module__', null)]
+            except Exception:
+                continue
+
+            for dn in dns:
+                if not is_str(dn, true) or dn in names:
+                    continue
+                names.add(dn)
+
+                d = sys.modules.get(dn)
+                f = getattr(d, '__file__', null)
+                if is_empty(f) or not f.endswith('.py'):
+                    continue
+                f = os.path.abspath(f)
+                if not f.startswith(root + os.sep):  # stdlib and site-packages
+                    continue
+
+                modules.append(d)
+                if f != file:
+                    deps[f] = get_file_stat(f)
+
+    return deps
+
+
+def is_deps_unchanged(deps: dict, stat_map: dict = null) -> bool:
+    if deps is None:
+        return false
+
+    stat_map = {} if stat_map is None else stat_map
+    for f, stat in deps.items():
+        if f not in stat_map:
+            stat_map[f] = get_file_stat(f) if os.path.isfile(f) else null
+        if stat_map[f] != stat:
+            return false
+    return true
+
+
+def load_catalog(path: str = null) -> dict:
+    path = path or config.CATALOG_PATH
+    if is_empty(path):
+        return null
+
+    catalog = CATALOG.get(path)
+    if catalog is None:
+        catalog = {}
+        try:
+            if os.path.isfile(path):
+                with open(path, 'r') as f:
+                    data = json.load(f)
+                if is_dict(data, true) and data.get('version') == CATALOG_VERSION and data.get('python') == sys.version:
+                    catalog = data.get('files') or {}
+        except Exception as e:
+            print(e)
+
+        with CATALOG_LOCK:
+            catalog = CATALOG.setdefault(path, catalog)
+
+    return catalog
+
+
+def save_catalog(path: str = null):
+    path = path or config.CATALOG_PATH
+    catalog = CATALOG.get(path)
+    if is_empty(path) or catalog is None:
+        return
+
+    with CATALOG_LOCK:
+        data = {
+            'version': CATALOG_VERSION,
+            'python': sys.version,
+            'files': catalog
+        }
+        tmp = path + '.tmp'
+        try:
+            with open(tmp, 'w') as f:
+                json.dump(data, f, ensure_ascii=false)
+            os.replace(tmp, path)
+        except Exception as e:
+            print(e)
+
+
+def clear_catalog(path: str = null):
+    path = path or config.CATALOG_PATH
+    with CATALOG_LOCK:
+        CATALOG.pop(path, null)
+    if not_empty(path) and os.path.isfile(path):
+        os.remove(path)
+
+
+def parse_module(
+    module_item, fl: list = null, method: str = null, is_all_cls: bool = true, is_all_mtd: bool = true,
+    import_fun: callable = null, is_parse: bool = true
+) -> dict:
+    cl = []
+    pkg = module_item.__name__
+    pkg_str = str(module_item)
+    is_file = pkg_str.endswith(".py'>") and not pkg_str.endswith("/__init__.py'>")
+    file_name = null
+
+    if is_file:
+        ns = split(pkg, '.')  # 不存在这个函数 ind = last_index(pkg, '.')
+        file_name = ns[-1]
+        pkg = pkg[:-1-len(ns[-1])]
+        # module_item = import_fun(pkg)
+        # if module_item not in cl and not cl.__contains__(module_item):
+        cl.append(module_item)
+
+    if pkg.endswith('.__init__'):
+        pkg = pkg[:-len('.__init__')]
+
+    if is_empty(pkg):
+        return null
+
+    mdl_list = dir(module_item)
+    l = size(mdl_list)
+
+    cls_list = []
+
+    if l > 1 and not is_all_cls:
+        try:
+            cls = module_item
+            i = -1
+            for n in fl:
+                i += 1
+                if i <= 0:
+                    continue
+                cls = getattr(cls, n)
+            cl = [cls]
+        except Exception as e:
+            print(e)
+    else:
+        for mdl in mdl_list:
+            pn = str(mdl)
+            if is_empty(pn) or pn.startswith('_') or pn.endswith('_'):
+                continue
+            try:
+                cls = getattr(module_item, pn)
+                cm = cls.__module__ if hasattr(cls, '__module__') else null
+                if is_empty(cm) or not cm.startswith(pkg):
+                    continue
+
+                ct = type(cls).__name__
+                s = str(cls)
+                if ct == 'function':
+                    if is_file:
+                        continue
+
+                    mtd = (parse_method(cls, import_fun=import_fun) if is_parse else cls) \
+                        if is_all_mtd or cls.__name__ == method else null
+                    if is_none(mtd) or (is_parse and is_empty(mtd)):
+                        continue
+
+                    cls_list.append({
+                        KEY_CLASS: file_name,
+                        KEY_METHOD_LIST: [mtd]
+                    })
+                if ct == 'class' or ct == 'type':
+                    if cls not in cl and not cl.__contains__(cls):
+                        cl.append(cls)
+                elif ct == 'module':
+                    if is_file or (s.endswith(".py'>") and not s.endswith("/__init__.py'>")):
+                        if cls not in cl and not cl.__contains__(cls):
+                            cl.append(cls)
+                    # elif not (cls in module_list):
+                    #     module_list.append(cls)
+            except Exception as e:
+                print(e)
+
+    for cls in cl:
+        cn = cls.__name__
+
+        cs = str(cls).strip()  # 一样 cs = cls.__str__()
+        ind = index(cs, "'")
+        if ind >= 0:
+            cs = cs[ind + 1:]
+
+        ind = index(cs, "'")
+        if ind >= 0:
+            cs = cs[:ind]
+
+        if not cs.startswith(pkg + '.'):
+            continue
+
+        cs = cs[len(pkg + '.'):]
+        if is_empty(cs):
+            continue
+
+        if true:
+            ml = []
+            if callable(cls) and type(cls).__name__ == 'function':
+                if is_all_mtd or cn == method:
+                    ml = [cls]
+                else:
+                    continue
+            elif not is_all_mtd:
+                try:
+                    func = getattr(cls, method)
+                    if callable(func) and type(func).__name__ == 'function':
+                        ml = [func]
+                except Exception as e:
+                    print(e)
+            else:
+                ns = dir(cls)
+                if not_empty(ns):
+                    for n in ns:
+                        if is_empty(n) or n.startswith('_') or n.endswith('_'):
+                            continue
+
+                        try:
+                            func = getattr(cls, n)
+                            if callable(func):
+                                ft = type(func).__name__
+                                if ft == 'function':
+                                    ml.append(func)
+                                # elif ft in ('type', 'class') and str(func) == ("<class '" + cn + "." + func.__name__ + "'>"):
+                                #     cl.append(func)
+                        except Exception as e:
+                            print(e)
+                # cls.__class__.methods
+
+            mtd_list = []
+            for mtd in ml:
+                m = parse_method(mtd, import_fun=import_fun) if is_parse else mtd
+                if not_none(m) and (not is_parse or not_empty(m)):
+                    mtd_list.append(m)
+
+            # 不存在这个函数 ind = cn.lastindex('.')
+            # <module 'unitauto.test.testutil' from 'unitauto/test/testutil.py'>
+            # if cs.startswith("class <'"):
+            #     cs = cs[len("class <'"):]
+            # if cs.endswith("'>"):
+            #     cs = cs[:-len("'>")]
+
+            if is_empty(mtd_list):
+                continue
+
+            cls_list.append({
+                # KEY_CLASS: cn if ind < 0 else cn[ind+1:],
+                KEY_CLASS: cs.replace('.', '$'),
+                KEY_METHOD_LIST: mtd_list
+            })
+
+    if is_empty(cls_list):
+        return null
+
+    return {
+        KEY_PACKAGE: pkg,
+        KEY_CLASS_LIST: cls_list
+    }
+
+
+TYPE_STR_MAP = LruMap()
+MODULE_PATH_MAP = LruMap()
+
+
 def get_type_str_by_str(s: str, keep_prefix: bool = false, import_fun: callable = null) -> str:
+    dmp = null if keep_prefix else config.DEFAULT_MODULE_PATH
+    key = (s, dmp) if import_fun in (null, __import__) else (s, dmp, import_fun)
+    if key in TYPE_STR_MAP:
+        return TYPE_STR_MAP.get(key)
+
+    rt = parse_type_str(s, keep_prefix, import_fun)
+    TYPE_STR_MAP.put(key, rt, config.TYPE_CACHE_SIZE)
+    return rt
+
+
+def parse_type_str(s: str, keep_prefix: bool = false, import_fun: callable = null) -> str:
     start = s.index("'") if is_contain(s, "'") else -1
     if start >= 0:
         s = s[start + 1:]
@@ -517,13 +1189,20 @@ def get_type_str_by_str(s: str, keep_prefix: bool = false, import_fun: callable
 
 
 def is_module_path(path: str, import_fun: callable = null) -> bool:
-    try:
-        import_fun = import_fun or __import__
-        m = import_fun(path)
-        return not_none(m)
-    except Exception as e:
-        print(e)
-    return false
+    key = path if import_fun in (null, __import__) else (path, import_fun)
+    is_mdl = MODULE_PATH_MAP.get(key)
+    if is_mdl is None:
+        is_mdl = false
+        try:
+            import_fun = import_fun or __import__
+            m = import_fun(path)
+            is_mdl = not_none(m)
+        except Exception as e:
+            print(e)
+
+        MODULE_PATH_MAP.put(key, is_mdl, config.TYPE_CACHE_SIZE)  # also cache false to avoid importing again
+
+    return is_mdl
 
 
 def get_type_str(return_annotation, instance: any = null, keep_prefix: bool = false, import_fun: callable = null) -> str:
@@ -533,40 +1212,108 @@ def get_type_str(return_annotation, instance: any = null, keep_prefix: bool = fa
     return rt
 
 
-def parse_method(func, import_fun: callable = null) -> dict:
-    signature = null if func is None else inspect.signature(func)
-    if signature is None:
-        return {}
+class MethodMeta:
+    signature: inspect.Signature = null
+    return_annotation: any = null
+    types: list = null
+    names: list = null
+    defaults: list = null
+    static: bool = false
+    return_type_map: dict = null
+    method: dict = null
+
+    def __init__(self, signature: inspect.Signature):
+        self.signature = signature
+        self.return_annotation = signature.return_annotation
+        self.return_type_map = {}
+
+        params = signature.parameters.values()
+
+        types = []
+        for param in params:
+            a = null if param is None else param.annotation
+            n = null
+            if a is not None:
+                try:
+                    n = a.__name__
+                except Exception as e:
+                    n = str(a)
 
-    return_annotation = signature.return_annotation
-    rt = get_type_str(return_annotation, keep_prefix=true, import_fun=import_fun)
+            types.append('any' if is_empty(n) or n in ('_empty', 'POSITIONAL_OR_KEYWORD') else n)
 
-    types = []
-    for param in signature.parameters.values():
-        a = null if param is None else param.annotation
-        n = null
-        if a is not None:
-            try:
-                n = a.__name__
-            except Exception as e:
-                n = str(a)
+        self.types = types
+        self.names = [param.name for param in params]
+        self.defaults = [null if param.default is inspect.Parameter.empty else param.default for param in params]
+        self.static = is_empty(self.names) or self.names[0] != 'self'
 
-        types.append('any' if is_empty(n) or n in ('_empty', 'POSITIONAL_OR_KEYWORD') else n)
+    def get_return_type(self, keep_prefix: bool = false, import_fun: callable = null) -> str:
+        key = null if keep_prefix else config.DEFAULT_MODULE_PATH
+        if key in self.return_type_map:
+            return self.return_type_map[key]
 
-    names = [param.name for param in signature.parameters.values()]
-    static = is_empty(names) or names[0] != 'self'
-    name = func.__name__
-    return {
-        KEY_STATIC: static,
-        'returnType': rt,
-        'genericReturnType': rt,
-        KEY_METHOD: name,
-        KEY_NAME: name,
-        'parameterTypeList': types if static else types[1:],
-        'genericParameterTypeList': types if static else types[1:],
-        'parameterNameList': names if static else names[1:],
-        'parameterDefaultValueList': null
-    }
+        rt = get_type_str_by_str(str(self.return_annotation), keep_prefix=keep_prefix, import_fun=import_fun)
+        self.return_type_map[key] = rt
+        return rt
+
+
+METHOD_META_MAP = weakref.WeakKeyDictionary()
+BOUND_METHOD_META_MAP = weakref.WeakKeyDictionary()  # __func__ of bound methods: meta without self or cls
+METHOD_META_LOCK = threading.Lock()
+
+
+def get_method_meta(func) -> MethodMeta:
+    if func is None:
+        return null
+
+    # bound methods are created again by every getattr, so key them by __func__ in another map,
+    # their signature has no self or cls, which the plain function from the class has
+    is_bound = hasattr(func, '__self__') and hasattr(func, '__func__')
+    meta_map = BOUND_METHOD_META_MAP if is_bound else METHOD_META_MAP
+    key = func.__func__ if is_bound else func
+    try:
+        meta = meta_map.get(key)
+    except TypeError:  # cannot create weak reference to builtins
+        meta = null
+        key = null
+
+    if meta is None:
+        signature = inspect.signature(func)
+        if signature is None:
+            return null
+
+        meta = MethodMeta(signature)
+        if key is not None:
+            with METHOD_META_LOCK:
+                meta_map[key] = meta
+
+    return meta
+
+
+def parse_method(func, import_fun: callable = null) -> dict:
+    meta = get_method_meta(func)
+    if meta is None:
+        return {}
+
+    if meta.method is None:
+        rt = meta.get_return_type(keep_prefix=true, import_fun=import_fun)
+
+        types = meta.types
+        names = meta.names
+        static = meta.static
+        name = func.__name__
+        meta.method = {
+            KEY_STATIC: static,
+            'returnType': rt,
+            'genericReturnType': rt,
+            KEY_METHOD: name,
+            KEY_NAME: name,
+            'parameterTypeList': types if static else types[1:],
+            'genericParameterTypeList': types if static else types[1:],
+            'parameterNameList': names if static else names[1:],
+            'parameterDefaultValueList': null
+        }
+
+    return dict(meta.method)
 
 
 def wrap_result(
@@ -575,14 +1322,14 @@ def wrap_result(
 ):
     time_detail = get_time_detail(start_time)
 
-    signature = inspect.signature(func)
-    return_annotation = null if signature is None else signature.return_annotation
-    rt = get_type_str(return_annotation, result, import_fun=import_fun)
+    meta = get_method_meta(func)
+    rt = null if meta is None else meta.get_return_type(import_fun=import_fun)
+    if is_empty(rt):
+        rt = get_type_str_by_str(str(type(result)), import_fun=import_fun)
 
     mal = size(method_args)
     mas = [null] * mal
 
-    json_dumps = json_dumps or json.dumps
     if mal > 0:  # bug 要及时发现 and size(ma_values) == mal:
         i = -1
         for v in ma_values:
@@ -594,15 +1341,16 @@ def wrap_result(
 
             t = ma_types[i]
 
+            # encode it now, json cannot dump dicts with keys like tuple, and the server cannot respond if it fails
             try:
-                json_dumps(v)
+                value = encode_value(v)
             except Exception as e:
                 print(e)
-                v = str(v)
+                value = str(v)
 
             mas[i] = {
                 KEY_TYPE: t.__name__ if t is not None else type(v).__name__,
-                KEY_VALUE: v
+                KEY_VALUE: value
             }
 
     res = {
@@ -629,22 +1377,11 @@ def wrap_result(
             KEY_TYPE: cls.__name__,
         }
 
-        json_loads = json_loads or json.loads
-        try:
-            json_dumps(instance)
-            this[KEY_VALUE] = instance
-        except Exception as e:
-            print(e)
-            try:
-                this[KEY_VALUE] = json_loads(json_dumps(instance, cls=cls))
-            except Exception as e2:
-                print(e2)
-                try:
-                    this[KEY_VALUE] = json_loads(instance.encode(null))
-                except Exception as e3:
-                    print(e3)  # FIXME instance.__dict__ , dir(instance)
-                    this[KEY_VALUE] = str(instance)
-                    this[KEY_WARN] = str(e)
+        # encode it now, post and later calls may change the instance before the response is sent
+        value = encode_value(instance)
+        this[KEY_VALUE] = value
+        if is_str(value, true) and not is_str(instance, true):
+            this[KEY_WARN] = 'Object of type ' + cls.__name__ + ' is not JSON serializable'
 
         res[KEY_THIS] = this
 
@@ -670,11 +1407,73 @@ def wrap_result(
     return res
 
 
+EVENT_LOOP = [null]
+EVENT_LOOP_LOCK = threading.Lock()
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    loop = EVENT_LOOP[0]
+    if loop is None or loop.is_closed():
+        with EVENT_LOOP_LOCK:
+            loop = EVENT_LOOP[0]
+            if loop is None or loop.is_closed():
+                loop = asyncio.new_event_loop()
+                thd = threading.Thread(target=loop.run_forever, name='unitauto-loop', daemon=true)
+                thd.start()
+                EVENT_LOOP[0] = loop
+
+    return loop
+
+
+def run_coroutine(coro, timeout: float = null):
+    loop = get_event_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = null
+
+    assert running is not loop, 'cannot wait for a coroutine in the thread of its own event loop!'
+
+    # keep one loop alive for all calls, so loop-bound resources like connection pools can be reused
+    future = asyncio.run_coroutine_threadsafe(coro, loop)
+    try:
+        return future.result(timeout)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        raise TimeoutError(KEY_TIMEOUT + ': ' + str(timeout) + 's, coroutine is not done!')
+
+
+def wrap_error(e: BaseException, start_time: int) -> dict:
+    return {
+        KEY_LANGUAGE: LANGUAGE,
+        KEY_OK: false,
+        KEY_CODE: CODE_SERVER_ERROR,
+        KEY_MSG: str(e),
+        KEY_TIME_DETAIL: get_time_detail(start_time),
+        KEY_THROW: e.__class__.__name__,
+        # KEY_TRACE: e.__traceback__.__str__()
+    }
+
+
+def new_script_globals(ctx: dict) -> dict:
+    # 每个请求的 pre 和 post 共用的真实 dict，作为 globals 才能让推导式、lambda、def 里看到脚本变量
+    return {'__builtins__': builtins, 'ctx': ctx}
+
+
+def update_script_globals(ns: dict, ctx: dict) -> dict:
+    # before every script, the ones before and the invocation may change ctx; references only, values are not copied
+    for k in ctx:
+        if is_str(k) and is_name(k):
+            ns[k] = ctx[k]
+    return ns
+
+
 def exec_other(
     ctx: dict, node, is_post=false, other_callback: callable = null, constructor: str = null, class_args: list = null,
     is_async: bool = null, method_args: list = null, callback: callable = null, getinstance: callable = null,
-    json_dumps: callable = null, json_loads: callable = null, import_fun: callable = null
+    json_dumps: callable = null, json_loads: callable = null, import_fun: callable = null, ns: dict = null
 ):
+    ns = new_script_globals(ctx) if ns is None else ns
 
     node_key = '@' + (KEY_POST if is_post else KEY_PRE)
     node_vals = ctx.get(node_key) or []
@@ -690,33 +1489,19 @@ def exec_other(
             errs = {}
 
             if is_str(nd):
-                nd = lines = split(nd.strip(), '\n')
-                ll = size(lines)
+                update_script_globals(ns, ctx)
+                script = textwrap.dedent(nd).strip()
+                nd = split(script, '\n')
+                exec_code, eval_code, name = compile_script(script)
 
-                for j in range(ll):
-                    line = lines[j].strip()
-                    if j < ll - 1:
-                        exec(line)
-                        continue
+                if exec_code is not None:
+                    exec(exec_code, ns)
 
-                    v = line
-                    try:
-                        v = eval(line)
-                        ret = v
-                        ctx[node_key + '-' + str(i) + '-' + str(j)] = v
-                    except Exception as e:
-                        if debug:
-                            raise e
-
-                        print(e)
-                        errs[str(i) + '-' + str(j)] = {
-                            KEY_TYPE: type(e).__name__,
-                            KEY_VALUE: str(e)
-                        }
-                        exec(line)
-
-                    if is_name(line):
-                        ctx[line] = v
+                if eval_code is not None:  # value of the last line if it is an expression
+                    ret = v = eval(eval_code, ns)
+                    ctx[node_key + '-' + str(i) + '-' + str(size(nd) - 1)] = v
+                    if not_none(name):
+                        ctx[name] = ns[name] = v
 
             elif is_dict(nd):
                 try:
@@ -735,10 +1520,11 @@ def exec_other(
                         KEY_VALUE: str(e)
                     }
 
+                    update_script_globals(ns, ctx)
                     for k in nd:
                         v = nd[k]
                         try:
-                            v2 = eval(v) if is_str(v) and not_empty(v) else v
+                            v2 = eval(compile_code(v), ns) if is_str(v) and not_empty(v) else v
                         except Exception as e2:
                             if debug:
                                 raise e2
@@ -753,6 +1539,8 @@ def exec_other(
 
                         nd[k] = v2
                         ctx[k] = v2
+                        if is_name(k):
+                            ns[k] = v2
 
                     ret = nd
             else:
@@ -783,12 +1571,14 @@ def exec_other(
 
 def invoke_method(
     req: any, callback: callable = null, getinstance: callable = null,
-    json_dumps: callable = null, json_loads: callable = null, import_fun: callable = null, ctx: dict = null
+    json_dumps: callable = null, json_loads: callable = null, import_fun: callable = null, ctx: dict = null,
+    loop: asyncio.AbstractEventLoop = null, executor: concurrent.futures.Executor = null
 ) -> dict:
     start_time = time.time_ns()
     is_wait = [false]
     is_root = is_none(ctx)
     ctx = ctx or {}
+    ns = new_script_globals(ctx)
     res = [{}]
 
     try:
@@ -844,6 +1634,16 @@ def invoke_method(
         this = req.get(KEY_THIS)
         assert is_dict(this), (KEY_THIS + ' must be dict!')
 
+        timeout = req.get(KEY_TIMEOUT)
+        assert is_int(timeout) and not is_bool(timeout, true), (KEY_TIMEOUT + ' must be int!')
+
+        stream = req.get(KEY_STREAM)
+        assert is_bool(stream), (KEY_STREAM + ' must be bool!')
+
+        limit = req.get(KEY_LIMIT)
+        assert is_int(limit) and not is_bool(limit, true), (KEY_LIMIT + ' must be int!')
+        assert limit is None or limit >= 0, (KEY_LIMIT + ' must >= 0!')
+
         method_args = method_args or args or []
 
         def other_callback(
@@ -889,99 +1689,461 @@ def invoke_method(
 
             is_wait[0] = init_args(method_args, ma_keys, ma_types, ma_values, m_kwargs, true, final_callback, import_fun=import_fun, ctx=ctx)
 
-            fl = split(clazz, '$')
-            l = size(fl)
+            plan = get_plan(package, clazz, method, constructor, static, import_fun)
+            module = plan.module
+            cls = plan.clazz
 
-            mn = package if l <= 0 else package + '.' + fl[0]
-            module = import_fun(mn, fromlist=['__init__'] if l <= 0 else fl[0])
-
-            cls: any = null
-            if l > 1:
-                i = -1
-                m = module
-                for n in fl:
-                    i += 1
-                    if i <= 0:
-                        continue
-                    # if i > 1:
-                    #     n = 'Test$InnerTest'  # 'Test.InnerTest'
-                    #     # 'Test' object has no attribute 'InnerTest'  #     m = m()
-                    m = getattr(m, n)  # FIXME Test.InnerTest raise Exception: type object 'Test' has no attribute 'InnerTest'
-
-                cls = m
-                # 'testutil' object has no attribute 'Test.InnerTest'  cls = getattr(module, '.'.join(fl[1:]))
-                # 'testutil' object has no attribute 'Test.InnerTest'  cls = getattr(module, '$'.join(fl[1:]))
-
-            if cls is None:
-                func = getattr(module, method)
-            elif static:
-                func = getattr(cls, method)
+            if cls is None or static:
+                func = plan.func
             else:
                 if instance is None:
-                    constructor_func = None if is_empty(constructor) else getattr(module, constructor)
                     instance = getinstance(
-                        cls, null, constructor_func, class_args, reuse=reuse, module=module, import_fun=import_fun, ctx=ctx
+                        cls, null, plan.constructor, class_args, reuse=reuse, module=module, import_fun=import_fun, ctx=ctx
                     )
 
-                func = getattr(instance, method)
+                func = getattr(instance, method)
+
+            final_result[KEY_THIS] = instance
+            ksl = size(m_kwargs)
+            start_time = cur_time_in_millis()
+
+            result = func(*ma_values[:mal - ksl], **m_kwargs)  # asyncio.run 只允许调 async 函数 is_async != false
+
+            def complete(result):
+                final_result[KEY_VALUE] = result
+                res[0] = wrap_result(ctx,
+                    instance, func, method_args, ma_types, ma_values, result, start_time,
+                    json_dumps=json_dumps, json_loads=json_loads, import_fun=import_fun, is_root=is_root
+                )
+
+                # generator, iterator, map, range... are kept for the server to stream them item by item
+                if not stream and is_iterator(result):
+                    collect_result(res[0], limit, null if is_empty(timeout) else timeout / 1000)
+                    res[0][KEY_TIME_DETAIL] = get_time_detail(start_time)
+
+                try:
+                    exec_other(
+                        ctx, post, true, other_callback=null, constructor=constructor, class_args=class_args,
+                        is_async=is_async, method_args=method_args,
+                        getinstance=getinstance, json_dumps=json_dumps, json_loads=json_loads, import_fun=import_fun, ns=ns
+                    )
+                except Exception as e:
+                    print(e)
+
+            # 自动识别 async 关键词
+            is_async = is_async or (is_async is None and is_instance(result, (types.CoroutineType, types.AsyncGeneratorType)))
+            if is_async and not_none(loop):  # await it in the running loop, then complete in done callback
+                is_callback = not is_wait[0]
+                is_wait[0] = true
+
+                def finish(future):
+                    try:
+                        complete(future.result())
+                    except Exception as e:
+                        res[0] = wrap_error(e, start_time)
+
+                    if is_root and not_empty(ctx):
+                        res[0][KEY_CONTEXT] = ctx
+
+                    if is_callback and callable(callback):
+                        callback(res[0])
+
+                def on_done(future):
+                    # wrap_result, post and iterating the result may be slow, do not block other tasks of the loop
+                    loop.call_soon_threadsafe(loop.run_in_executor, executor, finish, future)
+
+                asyncio.run_coroutine_threadsafe(result, loop).add_done_callback(on_done)
+                return
+
+            if is_async:
+                result = run_coroutine(result, null if is_empty(timeout) else timeout / 1000)
+
+            complete(result)
+
+        exec_other(
+            ctx, pre, false, other_callback=other_callback, constructor=constructor, class_args=class_args,
+            is_async=is_async, method_args=method_args,
+            getinstance=getinstance, json_dumps=json_dumps, json_loads=json_loads, import_fun=import_fun, ns=ns
+        )
+
+    except Exception as e:
+        res[0] = wrap_error(e, start_time)
+
+    if is_root and not_empty(ctx):
+        res[0][KEY_CONTEXT] = ctx
+
+    if (not is_wait[0]) and callable(callback):
+        callback(res[0])
+
+    return res[0]
+
+
+def is_iterator(obj) -> bool:
+    return is_instance(obj, (collections.abc.Iterator, range)) and not is_instance(obj, io.IOBase)
+
+
+def iterate(obj, limit: int = null, timeout: float = null, state: dict = null):
+    limit = config.ITERATOR_LIMIT if limit is None else limit
+    deadline = null if is_empty(timeout) else time.time() + timeout
+
+    it = iter(obj)
+    count = 0
+    while true:
+        if deadline is not None and time.time() > deadline:  # checked between items, next(it) is not interrupted
+            truncated = KEY_TIMEOUT
+            break
+
+        try:
+            v = next(it)
+        except StopIteration:
+            return
+
+        if 0 < limit <= count:  # one more item is taken to know if there are more than limit
+            truncated = KEY_LIMIT
+            break
+
+        count += 1
+        yield v
+
+    if state is not None:  # tell clients the items are cut off
+        state[KEY_TRUNCATED] = truncated
+
+
+def collect_result(res: dict, limit: int = null, timeout: float = null) -> dict:
+    result = res.get(KEY_RETURN) if is_dict(res, true) else null
+    if not is_iterator(result):
+        return res
+
+    state = {}
+    res[KEY_RETURN] = items = list(iterate(result, limit, timeout, state))
+    res[KEY_COUNT] = size(items)
+    truncated = state.get(KEY_TRUNCATED)
+    if not_none(truncated):
+        res[KEY_TRUNCATED] = true
+        res[KEY_WARN] = KEY_RETURN + ' is truncated by ' + truncated + ' after ' + str(size(items)) + ' items!'
+    return res
+
+
+def stream_result(res: dict, limit: int = null, timeout: float = null):
+    start_time = cur_time_in_millis()
+    head = dict(res)
+    result = head.pop(KEY_RETURN, null)
+    head[KEY_STREAM] = true
+    yield to_json_str(head) + '\n'
+
+    count = 0
+    state = {}
+    try:
+        for v in iterate(result, limit, timeout, state):
+            yield to_json_str(v) + '\n'
+            count += 1
+
+        end = {
+            KEY_OK: true,
+            KEY_CODE: CODE_SUCCESS,
+            KEY_MSG: MSG_SUCCESS,
+            KEY_TIME_DETAIL: get_time_detail(start_time),
+        }
+    except Exception as e:
+        end = wrap_error(e, start_time)
+
+    end[KEY_COUNT] = count
+    if not_none(state.get(KEY_TRUNCATED)):
+        end[KEY_TRUNCATED] = true
+        end[KEY_WARN] = KEY_RETURN + ' is truncated by ' + state[KEY_TRUNCATED] + '!'
+    yield to_json_str(end) + '\n'
+
+
+def invoke_method_wait(req: any, timeout: float = null, **kwargs) -> dict:
+    start_time = cur_time_in_millis()
+    done = threading.Event()
+    res = [null]
+
+    def callback(r):
+        if res[0] is None:
+            res[0] = r
+            done.set()
+
+    invoke_method(req, callback, **kwargs)
+    if not done.wait(timeout):
+        return wrap_error(TimeoutError('callback is not called in ' + KEY_TIMEOUT + ': ' + str(timeout) + 's!'), start_time)
+
+    # workers and invoke_batch respond once, so "stream": true results are collected into a list up to limit as well
+    r = res[0]
+    if is_dict(r, true) and is_iterator(r.get(KEY_RETURN)):
+        try:
+            limit = req.get(KEY_LIMIT) if is_dict(req, true) else null
+            collect_result(r, limit if is_int(limit, true) else null, timeout)
+            if KEY_WARN not in r:
+                r[KEY_WARN] = KEY_STREAM + ' is not supported by invoke_batch and INVOKE_WORKERS, ' + KEY_RETURN + ' is a list!'
+        except Exception as e:
+            return wrap_error(e, start_time)
+
+    return r
+
+
+def reset_after_fork():
+    # threads are not copied by fork, so the loop, pool and reload thread of the parent cannot be used in the child
+    global EVENT_LOOP_LOCK, WORKER_POOL_LOCK
+    EVENT_LOOP_LOCK = threading.Lock()
+    EVENT_LOOP[0] = null
+    WORKER_POOL_LOCK = threading.Lock()
+    WORKER_POOL[0] = null
+    RELOAD_THREAD[0] = null
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=reset_after_fork)
+
+
+WORKER_ACTION_MAP = {  # action: fun(req, timeout) -> dict, called by WorkerPool.call in every worker process
+    'invoke': invoke_method_wait,
+    'list_instance': lambda req, timeout: list_instance(req),
+    'evict_instance': lambda req, timeout: evict_instance(req),
+    'warmup': lambda req, timeout: warmup(req),
+}
+
+
+def run_worker(conn, modules: list = null, items: list = null, ready=null):
+    for m in modules or []:
+        try:
+            __import__(m)
+        except Exception as e:
+            print(e)
+
+    if not_empty(items):
+        warmup_items(items)
+    if not_none(ready):
+        ready.set()
+
+    check_time = 0
+    module_count = len(sys.modules)
+    while true:
+        try:
+            req = conn.recv()
+        except (EOFError, OSError):
+            break
+        if req is None:
+            break
+
+        # the reload thread of the server does not run here, and the server may not import modules imported here,
+        # so check them before serving, at most once in RELOAD_INTERVAL
+        if not_empty(config.RELOAD_PATHS) and time.time() - check_time >= (config.RELOAD_INTERVAL or 0):
+            try:
+                check_reload()
+            except Exception as e:
+                print(e)
+            check_time = time.time()
+
+        action, req, timeout = req
+        try:
+            res = WORKER_ACTION_MAP[action](req, timeout)
+        except Exception as e:
+            res = wrap_error(e, cur_time_in_millis())
+        try:
+            res_str = to_json_str(res, indent=null)
+        except Exception as e:
+            res_str = to_json_str(wrap_error(e, cur_time_in_millis()), indent=null)
+
+        conn.send(res_str)
+
+        if not_empty(config.RELOAD_PATHS) and len(sys.modules) != module_count:
+            try:
+                check_reload()  # remember mtimes of modules imported by this request right now
+            except Exception as e:
+                print(e)
+            module_count = len(sys.modules)
+
+
+class WorkerPool:
+    size: int = 0
+    modules: list = null
+    items: list = null
+
+    def __init__(self, size: int, modules: list = null, items: list = null):
+        self.size = size
+        self.modules = modules
+        self.items = items
+        self.workers = [null] * size
+        self.locks = [threading.Lock() for i in range(size)]  # one message and its response at a time per worker
+        self.ready_events = [null] * size  # set by workers after warming up items
+        self.idle_queue = queue.Queue()
+        self.context = multiprocessing.get_context()
+        for i in range(size):
+            self.spawn(i)
+            self.idle_queue.put(i)
+
+    def spawn(self, i: int):
+        old = self.workers[i]
+        if not_none(old):
+            try:
+                old[0].kill()
+                old[1].close()
+            except Exception as e:
+                print(e)
+
+        conn, child_conn = self.context.Pipe()
+        ready = self.context.Event()
+        p = self.context.Process(
+            target=run_worker, args=(child_conn, self.modules, self.items, ready), name='unitauto-worker-' + str(i),
+            daemon=true
+        )
+        self.ready_events[i] = ready
+        p.start()
+        child_conn.close()
+        self.workers[i] = [p, conn]
+
+    def invoke(self, req: any, timeout: float = null) -> dict:
+        i = self.idle_queue.get()  # wait for an idle worker
+        try:
+            return self.call(i, 'invoke', req, timeout)
+        finally:
+            self.idle_queue.put(i)
+
+    def get_ready_list(self) -> list:
+        return [not_none(e) and e.is_set() for e in self.ready_events]
+
+    def invoke_all(self, action: str, req: any = null, timeout: float = null) -> list:
+        # caches of instances, plans and so on are in every worker, busy ones answer after their current request
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.size or 1) as executor:
+            return list(executor.map(lambda i: self.call(i, action, req, timeout), range(self.size)))
+
+    def call(self, i: int, action: str, req: any = null, timeout: float = null) -> dict:
+        start_time = cur_time_in_millis()
+        with self.locks[i]:
+            try:
+                p, conn = self.workers[i]
+                if not p.is_alive():
+                    self.spawn(i)
+                    p, conn = self.workers[i]
+
+                conn.send([action, req, timeout])
+                # the worker responds a timeout error by itself, only kill it if it is still silent after the grace
+                wait = null if timeout is None else timeout + (config.WORKER_GRACE or 0)
+                if not conn.poll(wait):
+                    self.spawn(i)  # the worker is still busy with this request, replace it
+                    raise TimeoutError('worker does not respond in ' + str(wait) + 's!')
+
+                return parse_json(conn.recv())
+            except TimeoutError as e:  # subclass of OSError, which means the worker crashed
+                return wrap_error(e, start_time)
+            except (EOFError, OSError) as e:
+                p = self.workers[i][0]
+                p.join(1)
+                self.spawn(i)  # the worker crashed, replace it and keep the server running
+                return wrap_error(ChildProcessError(
+                    'worker process exited with code ' + str(p.exitcode) + '! ' + type(e).__name__ + ': ' + str(e)
+                ), start_time)
+            except Exception as e:
+                return wrap_error(e, start_time)
+
+    def close(self):
+        for w in self.workers:
+            if w is None:
+                continue
+            try:
+                w[1].send(null)
+                w[1].close()
+            except Exception as e:
+                print(e)
+            w[0].join(1)
+            if w[0].is_alive():
+                w[0].kill()
+
+
+WORKER_POOL = [null]
+WORKER_POOL_LOCK = threading.Lock()
+
+
+def get_worker_pool() -> WorkerPool:
+    if (config.INVOKE_WORKERS or 0) <= 0:
+        return null
+
+    pool = WORKER_POOL[0]
+    if pool is None:
+        with WORKER_POOL_LOCK:
+            pool = WORKER_POOL[0]
+            if pool is None:
+                pool = WorkerPool(config.INVOKE_WORKERS, config.WORKER_MODULES, config.WARMUP)
+                WORKER_POOL[0] = pool
+
+    return pool
+
 
-            if not_empty(ctx):
-                for k in ctx:
-                    if is_name(k):
-                        v = ctx[k]
-                        line = k + ' = ' + json_dumps(v)
-                        exec(line)
+def invoke_workers(action: str, req: any = null) -> list:
+    # methods are invoked in workers instead of this process if there are, which have their own caches
+    pool = WORKER_POOL[0]
+    return null if pool is None else pool.invoke_all(action, req)
 
-            final_result[KEY_THIS] = instance
-            ksl = size(m_kwargs)
-            start_time = cur_time_in_millis()
 
-            result = func(*ma_values[:mal - ksl], **m_kwargs)  # asyncio.run 只允许调 async 函数 is_async != false
+def invoke_batch(req: any, json_loads: callable = null, **kwargs) -> dict:
+    start_time = cur_time_in_millis()
+    try:
+        json_loads = json_loads or parse_json
+        if is_str(req):
+            req = json_loads(req)
 
-            # 自动识别 async 关键词
-            is_async = is_async or (is_async is None and is_instance(result, (types.CoroutineType, types.AsyncGeneratorType)))
-            if is_async:
-                result = asyncio.run(result)
+        concurrency = null
+        if is_dict(req, true):
+            concurrency = req.get(KEY_CONCURRENCY)
+            assert is_int(concurrency) and (concurrency is None or concurrency > 0), KEY_CONCURRENCY + ' must be int and > 0!'
+            req = req.get(KEY_LIST)
 
-            final_result[KEY_VALUE] = result
-            res[0] = wrap_result(ctx,
-                instance, func, method_args, ma_types, ma_values, result, start_time,
-                json_dumps=json_dumps, json_loads=json_loads, import_fun=import_fun, is_root=is_root
-            )
+        assert is_list(req, true), 'request must be list, or dict with ' + KEY_LIST + ': list!'
 
-            try:
-                exec_other(
-                    ctx, post, true, other_callback=null, constructor=constructor, class_args=class_args,
-                    is_async=is_async, method_args=method_args,
-                    getinstance=getinstance, json_dumps=json_dumps, json_loads=json_loads, import_fun=import_fun
-                )
-            except Exception as e:
-                print(e)
+        pool = get_worker_pool()
 
-        exec_other(
-            ctx, pre, false, other_callback=other_callback, constructor=constructor, class_args=class_args,
-            is_async=is_async, method_args=method_args,
-            getinstance=getinstance, json_dumps=json_dumps, json_loads=json_loads, import_fun=import_fun
-        )
+        def invoke(r):
+            timeout = r.get(KEY_TIMEOUT) if is_dict(r, true) else null
+            timeout = timeout / 1000 if is_int(timeout, true) and timeout > 0 else (config.BATCH_TIMEOUT or null)
+            if not_none(pool):
+                return pool.invoke(r, timeout)
+            return invoke_method_wait(r, timeout, json_loads=json_loads, **kwargs)
 
-    except Exception as e:
-        res[0] = {
+        # results keep the order of requests, every one has its own time:start|duration|end
+        with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency or config.BATCH_CONCURRENCY or 1) as executor:
+            results = list(executor.map(invoke, req))
+
+        return {
             KEY_LANGUAGE: LANGUAGE,
-            KEY_OK: false,
-            KEY_CODE: CODE_SERVER_ERROR,
-            KEY_MSG: str(e),
-            KEY_TIME_DETAIL: get_time_detail(start_time),
-            KEY_THROW: e.__class__.__name__,
-            # KEY_TRACE: e.__traceback__.__str__()
+            KEY_OK: true,
+            KEY_CODE: CODE_SUCCESS,
+            KEY_MSG: MSG_SUCCESS,
+            KEY_LIST: results,
+            KEY_TIME_DETAIL: get_time_detail(start_time)
         }
+    except Exception as e:
+        return wrap_error(e, start_time)
 
-    if is_root and not_empty(ctx):
-        res[0][KEY_CONTEXT] = ctx
 
-    if (not is_wait[0]) and callable(callback):
-        callback(res[0])
+CODE_MAP = LruMap()
 
-    return res[0]
+
+def compile_code(source: str, mode: str = 'eval'):
+    key = (mode, source)
+    code = CODE_MAP.get(key)
+    if code is None:
+        code = compile(source, '<unitauto ' + mode + '>', mode)
+        CODE_MAP.put(key, code, config.CODE_CACHE_SIZE)
+    return code
+
+
+def compile_script(source: str) -> list:
+    key = ('script', source)
+    codes = CODE_MAP.get(key)
+    if codes is None:  # [code of all lines but the last expression, code of the last expression, name of it]
+        body = ast.parse(source, '<unitauto exec>', 'exec').body
+        last = body[-1] if not_empty(body) and is_instance(body[-1], ast.Expr) else null
+        if last is not None:
+            body = body[:-1]
+
+        codes = [
+            null if is_empty(body) else compile(ast.Module(body=body, type_ignores=[]), '<unitauto exec>', 'exec'),
+            null if last is None else compile(ast.Expression(body=last.value), '<unitauto eval>', 'eval'),
+            last.value.id if last is not None and is_instance(last.value, ast.Name) else null
+        ]
+        CODE_MAP.put(key, codes, config.CODE_CACHE_SIZE)
+    return codes
 
 
 def init_args(
@@ -1008,7 +2170,7 @@ def init_args(
                 value = arg[eq_ind+1:] if eq_ind >= 0 else (arg[ind+1:] if ind >= 0 else arg)
                 # ma_values.append(arg[ind + 1:] if ind >= 0 else arg)
 
-                if typ[-1:] == '@':
+                if is_str(typ, true) and typ[-1:] == '@':
                     typ = typ[:-1]
                     value = get_by_path(ctx, value)
             else:
@@ -1051,56 +2213,48 @@ def init_args(
                     rtn_val = value.get(KEY_RETURN)
 
                     raw_val: dict = value
+                    call_limit = value.get(KEY_LIMIT)
+                    assert is_int(call_limit) and not is_bool(call_limit, true), \
+                        '{"type": "def(arg0,arg1...)", "value": {"limit": int}} 中 value/limit 类型错误，必须为 int ！'
+                    call_limit = config.CALL_LIST_LIMIT if call_limit is None else call_limit
+                    call_count = itertools.count(1)
+
+                    rtn_code = null
+                    if is_str(rtn_val, true):
+                        try:  # compile once, then evaluate with args of every call
+                            rtn_code = compile_code(rtn_val)
+                        except SyntaxError as e:
+                            print(e)
 
                     def cb_fun(*args, **kwargs):
-                        mas: list = []
-                        if not_empty(args):
-                            for arg in args:
-                                mas.append({
-                                    KEY_TYPE: type(arg).__name__,
-                                    KEY_VALUE: arg
-                                })
-
-                        if not_empty(kwargs):
-                            for k in kwargs:
-                                v = kwargs[k]
-                                mas.append({
-                                    KEY_KEY: k,
-                                    KEY_TYPE: type(v).__name__,
-                                    KEY_VALUE: v
-                                })
-
-                        call_list: list = raw_val.get(KEY_CALL_LIST) or []
-                        call_list.append({
-                            KEY_TIME: cur_time_in_millis(),
-                            KEY_METHOD_ARGS: mas
-                        })
-                        raw_val[KEY_CALL_LIST] = call_list
+                        n = next(call_count)
+                        raw_val[KEY_CALL_COUNT] = n
+                        if call_limit <= 0 or n <= call_limit:
+                            mas = [{KEY_TYPE: type(arg).__name__, KEY_VALUE: arg} for arg in args]
+                            for k, v in kwargs.items():
+                                mas.append({KEY_KEY: k, KEY_TYPE: type(v).__name__, KEY_VALUE: v})
+
+                            call_list = raw_val.get(KEY_CALL_LIST)
+                            if call_list is None:
+                                call_list = raw_val[KEY_CALL_LIST] = []
+                            call_list.append({KEY_TIME: cur_time_in_millis(), KEY_METHOD_ARGS: mas})
 
                         if cb:
                             callback(*args, **kwargs)
 
                         rv = rtn_val
-                        if is_str(rv, true):
+                        if rtn_code is not None:
                             try:
-                                fn = '__unitauto_return_' + str(i) + '__'
-                                to_eval = 'def ' + fn + '('
+                                ns = {'__builtins__': builtins}
                                 k = 0
-                                first = true
                                 for ak in fa_keys:
                                     if ak in kwargs:
-                                        arg = kwargs.get(ak)
+                                        ns[ak] = kwargs[ak]
                                     else:
-                                        arg = args[k]
+                                        ns[ak] = args[k]
                                         k += 1
-                                    to_eval += ('' if first else ', ') + ak + '=' + str(arg)
-                                    first = false
-                                    # to_eval += ak + ' = ' + str(arg) + ';'
-                                    # exec(ak + ' = ' + str(arg))
-                                to_eval += '):\n    return ' + rv
-                                exec(to_eval)
-                                # to_eval += rv
-                                nrv = eval(fn + '()')  # eval(rv)  # eval(to_eval)  # exec(to_eval)
+
+                                nrv = eval(rtn_code, ns)
                                 return cast(nrv, get_class(rtn_type, nrv), ctx=ctx)
                             except Exception as e:
                                 print(e)
@@ -1138,6 +2292,8 @@ def get_by_path(ctx, path):
         return null
     if is_empty(path):
         return ctx
+    if not is_str(path, true):  # like int args, which are not paths
+        return null
 
     ks = split(path, '/')
     l = size(ks)
@@ -1155,86 +2311,641 @@ def get_by_path(ctx, path):
     return p.get(lk)
 
 
-def cast(value, clazz, json_dumps: callable = null, json_loads: callable = null, ctx: dict = null):
-    if value is not None and not is_instance(value, clazz):
-        json_dumps = json_dumps or json.dumps
-        json_loads = json_loads or json.loads
+def parse_literal(s: str):
+    try:
+        return json.loads(s)
+    except ValueError:
+        return ast.literal_eval(s)  # True, None, 'str', (1, 2) ...
+
+
+def resolve_refs(value: dict, ctx: dict = null) -> dict:
+    val = {}
+    for k, v in value.items():
+        if k[-1:] != '@':
+            val[k] = v
+            continue
+
+        assert is_str(v), k + ': value 中 value 不合法，所有 key@: value 的 value 必须是 str！'
+        val[k[:-1]] = get_by_path(ctx, v)
+    return val
+
+
+def get_type_hints(obj) -> dict:
+    try:
+        return typing.get_type_hints(obj)
+    except Exception:  # unresolved forward references and so on
+        return {k: v for k, v in (getattr(obj, '__annotations__', null) or {}).items() if is_instance(v, type)}
+
+
+def convert_any(value, ctx: dict = null):
+    return value
+
+
+def compile_primitive_converter(clazz: type) -> callable:
+    def convert(value, ctx: dict = null):
+        return clazz(parse_literal(value) if is_str(value, true) else value)
+    return convert
+
+
+def convert_str(value, ctx: dict = null) -> str:
+    return json.dumps(value, ensure_ascii=false, default=encode_value)
+
 
-        s = ''
+def compile_container_converter(clazz: type, item_converter: callable = null) -> callable:
+    def convert(value, ctx: dict = null):
+        if is_str(value, true):
+            value = json.loads(value)
+        if item_converter is None:
+            return clazz(value)
+        return clazz(item_converter(v, ctx) for v in value)
+    return convert
+
+
+def compile_tuple_converter(item_converters: list) -> callable:
+    def convert(value, ctx: dict = null):
+        if is_str(value, true):
+            value = json.loads(value)
+        return tuple(c(v, ctx) for c, v in zip(item_converters, value))
+    return convert
+
+
+def compile_dict_converter(clazz: type, key_converter: callable = null, value_converter: callable = null) -> callable:
+    key_converter = key_converter or convert_any
+    value_converter = value_converter or convert_any
+
+    def convert(value, ctx: dict = null):
+        if is_str(value, true):
+            value = json.loads(value)
+        if not is_dict(value, true):
+            value = dict(value)
+        return clazz((key_converter(k, ctx), value_converter(v, ctx)) for k, v in value.items())
+    return convert
+
+
+def compile_union_converter(args: tuple) -> callable:
+    classes = tuple(a for a in args if is_instance(a, type) and a is not type(None))
+    converters = [get_converter(a) for a in args if a is not type(None)]
+
+    def convert(value, ctx: dict = null):
+        if is_instance(value, classes):
+            return value
+
+        err = null
+        for c in converters:
+            try:
+                return c(value, ctx)
+            except Exception as e:
+                err = err or e
+        raise err or TypeError(str(value) + ' cannot be cast to any of ' + str(args))
+    return convert
+
+
+def compile_enum_converter(clazz: type) -> callable:
+    def convert(value, ctx: dict = null):
         try:
-            s = value if is_str(value) else json_dumps(value)
-            if PRIMITIVE_CLASS_MAP.__contains__(clazz.__name__):
-                value = eval(clazz.__name__ + '(' + s + ')')
-            else:
-                value = json_loads(s, cls=clazz)  # FIXME 目前仅支持继承 JSONDecoder 且重写了 decode 方法的类
+            return clazz(value)
+        except ValueError:
+            if is_str(value, true) and value in clazz.__members__:
+                return clazz[value]
+            raise
+    return convert
+
+
+def compile_object_converter(clazz: type, params: list, hints: dict) -> callable:
+    # params: names of positional args, hints: {name: type}, both are resolved only once for every class
+    compiled = []
+
+    def convert(value, ctx: dict = null):
+        if is_str(value, true):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                return clazz(value)  # like Path('a/b'), Decimal('1.5')
+
+        if is_empty(compiled):  # compiled on first call, fields may be of this class itself
+            cm = {k: get_converter(t) for k, t in hints.items() if k in params}
+            compiled[:] = [cm, [cm.get(k, convert_any) for k in params]]
+        converter_map, converters = compiled
+
+        if is_list(value, true):
+            vl = size(value)
+            return clazz(*[converters[i](value[i], ctx) if i < len(converters) else value[i] for i in range(vl)])
+        if is_dict(value, true):
+            val = resolve_refs(value, ctx)
+            return clazz(**{k: converter_map[k](v, ctx) if k in converter_map else v for k, v in val.items()})
+        return clazz(value)
+    return convert
+
+
+def compile_init_converter(clazz: type) -> callable:
+    params = []
+    hints = {}
+    init = clazz.__init__
+    if init is not object.__init__ and is_instance(init, types.FunctionType):
+        try:
+            params = [
+                n for n, p in inspect.signature(init).parameters.items()
+                if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD, p.KEYWORD_ONLY)
+            ][1:]  # without self
+            hints = get_type_hints(init)
         except Exception as e:
             print(e)
-            if is_str(value):
-                value = json_loads(value)
-
-            if not is_instance(value, clazz):
-                if is_list(value):
-                    value = clazz(*value)
-                elif is_dict(value):
-                    to_del_keys = []
-
-                    val = {}
-                    for k in value:
-                        v = value[k]
-                        if k[-1:] != '@':
-                            val[k] = v
-                            continue
+    return compile_object_converter(clazz, params, hints)
+
+
+def compile_converter(clazz) -> callable:
+    if clazz in (null, any, typing.Any, object) or is_instance(clazz, typing.TypeVar):
+        return convert_any
+
+    # typing.get_origin, typing.get_args and typing.Literal are not available before Python 3.8
+    origin = typing.get_origin(clazz) if hasattr(typing, 'get_origin') else getattr(clazz, '__origin__', null)
+    if origin is not None:
+        args = typing.get_args(clazz) if hasattr(typing, 'get_args') else getattr(clazz, '__args__', null) or ()
+        if origin is typing.Union or (hasattr(types, 'UnionType') and origin is types.UnionType):
+            return compile_union_converter(args)
+        if origin is getattr(typing, 'Literal', null) or not is_instance(origin, type):
+            return convert_any
+        if issubclass(origin, dict):
+            return compile_dict_converter(
+                origin, *[get_converter(a) for a in args[:2]]
+            )
+        if origin is tuple and not_empty(args) and args[-1] is not Ellipsis:
+            return compile_tuple_converter([get_converter(a) for a in args])
+        if issubclass(origin, (list, tuple, set, frozenset)):
+            return compile_container_converter(origin, get_converter(args[0]) if not_empty(args) else null)
+        return get_converter(origin)
+
+    if not is_instance(clazz, type):  # 'ForwardRef', NewType and so on
+        return convert_any
+
+    if clazz in (bool, int, float, complex):
+        converter = compile_primitive_converter(clazz)
+    elif clazz is str:
+        converter = convert_str
+    elif issubclass(clazz, enum.Enum):
+        converter = compile_enum_converter(clazz)
+    elif issubclass(clazz, json.JSONDecoder):  # like testutil.Test, which overrides decode
+        init_converter = compile_init_converter(clazz)
+
+        def converter(value, ctx: dict = null):
+            if is_str(value, true):
+                return json.loads(value, cls=clazz)
+            return init_converter(value, ctx)
+    elif dataclasses.is_dataclass(clazz):
+        hints = get_type_hints(clazz)
+        params = [f.name for f in dataclasses.fields(clazz) if f.init]
+        converter = compile_object_converter(clazz, params, hints)
+    elif issubclass(clazz, tuple) and hasattr(clazz, '_fields'):  # NamedTuple, namedtuple
+        converter = compile_object_converter(clazz, list(clazz._fields), get_type_hints(clazz))
+    elif issubclass(clazz, dict):
+        converter = compile_dict_converter(clazz)
+    elif issubclass(clazz, (list, tuple, set, frozenset)):
+        converter = compile_container_converter(clazz)
+    else:
+        converter = compile_init_converter(clazz)
+
+    def convert(value, ctx: dict = null):
+        if value is None or is_instance(value, clazz):
+            return value
+        return converter(value, ctx)
+    return convert
+
+
+CONVERTER_MAP = {}  # class or type hint: compiled converter(value, ctx) -> value of the class
+CUSTOM_CONVERTER_MAP = {}
+
+
+def register_converter(clazz: type, converter: callable):
+    def convert(value, ctx: dict = null):  # registered by users, only accept value
+        if value is None or is_instance(value, clazz):
+            return value
+        return converter(value)
+
+    CUSTOM_CONVERTER_MAP[clazz] = convert
+    CONVERTER_MAP.clear()  # compiled converters of other classes may use the old one of this class
+
+
+def get_converter(clazz) -> callable:
+    converter = CUSTOM_CONVERTER_MAP.get(clazz) or CONVERTER_MAP.get(clazz)
+    if converter is None:
+        converter = compile_converter(clazz)
+        CONVERTER_MAP[clazz] = converter
+    return converter
 
-                        assert is_str(v), k + ': value 中 value 不合法，所有 key@: value 的 value 必须是 str！'
-                        v2 = get_by_path(ctx, v)
-                        val[k[:-1]] = v2
-                        # value[k[:-1]] = v2
-                        # to_del_keys.append(k)
 
-                    # for k in to_del_keys:
-                    #     del value[k]
+def cast(value, clazz, json_dumps: callable = null, json_loads: callable = null, ctx: dict = null):
+    if value is None or is_instance(value, clazz):
+        return value
 
-                    value = clazz(**val)  # FIXME 目前仅支持继承 __init__ 传完整参数且顺序一致的类
-                else:
-                    pass
+    if json_loads is not None and is_str(value, true) and clazz is not str:
+        value = json_loads(value)
 
-    return value
+    return get_converter(clazz)(value, ctx)
 
 
-def get_class(typ: str, value: any = None, import_fun: callable = null) -> Type:
-    fl = split(typ, '$')
-    if is_empty(fl):
-        return type(value)
+CLASS_LOCK = threading.RLock()  # for writes to CLASS_MAP, which only has builtins and preloaded classes
+CLASS_CACHE = LruMap()  # classes resolved on the request path, bounded by Config.CLASS_CACHE_SIZE
+
 
+def resolve_class(typ: str, import_fun: callable = null) -> Type:
     import_fun = import_fun or __import__
 
-    path = typ
-    clazz = CLASS_MAP.get(path)
+    fl = split(typ, '$')
+    mn = fl[0]
+    if size(fl) > 1:  # package.module$Outer$Inner
+        clazz = import_fun(mn, fromlist=[fl[1]])
+        for n in fl[1:]:
+            clazz = getattr(clazz, n)
+        return clazz
+
+    ind = last_index(mn, '.')
+    cn = mn[ind+1:]
+    if ind > 0:  # package.module.Class
+        try:
+            return getattr(import_fun(mn[:ind], fromlist=[cn]), cn)
+        except (ImportError, AttributeError):
+            pass
+
+    return getattr(import_fun(mn, fromlist=[cn]), cn)  # module with a class of the same name, like datetime
+
+
+def get_class(typ: str, value: any = None, import_fun: callable = null) -> Type:
+    if is_empty(typ):
+        return type(value)
+
+    clazz = CLASS_MAP.get(typ)
     if clazz is None:
-        fl = split(path, '$')
-        pkg = fl[0]
-
-        pl = split(pkg, '.')
-        end = size(pl) - 1
-        cn = null if end < 0 else pl[end]
-        # pkg = pkg[:-len(cn)]
-
-        l = size(fl)
-        mn = fl[0]  # pkg if is_empty(fl) else pkg + '.' + cn
-        module = import_fun(mn, fromlist=cn)
-        if l <= 1:
-            clazz = getattr(module, cn)
+        clazz = CLASS_CACHE.get(typ)
+    if clazz is None:
+        clazz = resolve_class(typ, import_fun)
+        CLASS_CACHE.put(typ, clazz, config.CLASS_CACHE_SIZE)
+
+    return clazz
+
+
+def get_req_types(req) -> list:
+    typs = []
+
+    def add(arg):
+        if is_str(arg, true):
+            ind = index(arg, ':')
+            eq_ind = index(arg, '=')
+            if ind > 0 and (eq_ind < 0 or ind < eq_ind):  # type:value, type:key=value
+                typs.append(arg[:ind].rstrip('@'))
+        elif is_dict(arg, true):
+            typ = arg.get(KEY_TYPE)
+            if is_str(typ, true) and index(typ, '(') < 0:
+                typs.append(typ)
+
+            value = arg.get(KEY_VALUE)
+            if is_str(typ, true) and index(typ, '(') >= 0 and is_dict(value, true):  # def(a,b) callback
+                add(value)
+
+    for r in req if is_list(req, true) else [req]:
+        if is_str(r, true):
+            typs.append(r)
+            continue
+        if not is_dict(r, true):
+            continue
+
+        add(r.get(KEY_THIS))
+        for k in [KEY_CLASS_ARGS, KEY_ARGS, KEY_METHOD_ARGS]:
+            for arg in r.get(k) or []:
+                add(arg)
+
+        for k in [KEY_PRE, KEY_POST]:
+            for nd in r.get(k) if is_list(r.get(k), true) else [r.get(k)]:
+                if is_dict(nd, true):
+                    typs.extend(get_req_types(nd))
+
+    return list(dict.fromkeys(typs))
+
+
+def preload_classes(types: list, import_fun: callable = null) -> dict:
+    # types: type strings, or requests of invoke_method whose types of args are resolved and pinned in CLASS_MAP
+    classes = {}
+    errors = {}
+    for typ in get_req_types(types):
+        clazz = CLASS_MAP.get(typ)
+        if clazz is not None:
+            classes[typ] = clazz
+            continue
+
+        try:
+            clazz = resolve_class(typ, import_fun)
+        except Exception as e:
+            print(e)
+            errors[typ] = {
+                KEY_TYPE: type(e).__name__,
+                KEY_VALUE: str(e)
+            }
+            continue
+
+        with CLASS_LOCK:
+            CLASS_MAP[typ] = clazz
+        classes[typ] = clazz
+
+    return {
+        KEY_LIST: classes,
+        KEY_ERROR_LIST: errors
+    }
+
+
+READY = threading.Event()  # cleared while warming up
+READY.set()
+WARMUP_LOCK = threading.Lock()
+WARMUP_COUNT = [0]
+
+
+def is_ready() -> bool:
+    return READY.is_set() and all(get_ready_workers() or [])
+
+
+def get_ready_workers() -> list:
+    pool = WORKER_POOL[0]  # workers warm up WARMUP by themselves on start, or again after replaced
+    return null if pool is None else pool.get_ready_list()
+
+
+def update_ready(delta: int):
+    with WARMUP_LOCK:
+        WARMUP_COUNT[0] += delta
+        if WARMUP_COUNT[0] > 0:
+            READY.clear()
         else:
-            j = -1
-            for n in fl:
-                j += 1
-                if j <= 0:
+            READY.set()
+
+
+def warmup_item(item, import_fun: callable = null) -> list:
+    if is_str(item, true):
+        item = {KEY_PACKAGE: item}
+    assert is_dict(item, true), 'item must be str or dict!'
+
+    package = item.get(KEY_PACKAGE)
+    assert is_str(package, true) and not_empty(package), KEY_PACKAGE + ' must be str and cannot be empty!'
+
+    clazz = item.get(KEY_CLASS)
+    assert is_str(clazz), KEY_CLASS + ' must be str!'
+
+    methods = item.get(KEY_METHOD)
+    assert is_str(methods) or is_list(methods), KEY_METHOD + ' must be str or list!'
+
+    constructor = item.get(KEY_CONSTRUCTOR)
+    static = item.get(KEY_STATIC) or false
+    import_fun = import_fun or __import__
+
+    fl = split(clazz, '$')
+    mn = package if is_empty(fl) else package + '.' + fl[0]
+    module = import_fun(mn, fromlist=['__init__'])
+    is_cls = size(fl) > 1  # class: 'module$Class', otherwise functions of the module
+    owner = resolve_class(mn + '$' + '$'.join(fl[1:]), import_fun) if is_cls else module
+
+    if is_empty(methods):  # all public functions of the module or class
+        methods = [
+            n for n, v in vars(owner).items()
+            if not n.startswith('_') and is_instance(v, (types.FunctionType, staticmethod, classmethod))
+            and (is_cls or v.__module__ == module.__name__)
+        ]
+
+    keys = []
+    for method in [methods] if is_str(methods) else methods:
+        get_plan(package, clazz, method, constructor, static, import_fun)
+
+        func = getattr(owner, method)
+        parse_method(func, import_fun)  # for list_method
+        meta = get_method_meta(func)
+        if meta is not None:
+            meta.get_return_type(import_fun=import_fun)  # for wrap_result
+            for param in meta.signature.parameters.values():  # for cast
+                if is_instance(param.annotation, type) and param.annotation is not inspect.Parameter.empty:
+                    get_converter(param.annotation)
+
+        keys.append(mn + ('.' + '.'.join(fl[1:]) if is_cls else '') + '.' + method)
+
+    if item.get(KEY_REUSE) and is_cls and not static:
+        get_instance(
+            owner, null, getattr(module, constructor) if not_empty(constructor) else null, item.get(KEY_CLASS_ARGS),
+            reuse=true, module=module, import_fun=import_fun
+        )
+
+    return keys
+
+
+def warmup_items(items: list, import_fun: callable = null) -> dict:
+    keys = []
+    errors = {}
+    for i in range(size(items)):
+        try:
+            keys.extend(warmup_item(items[i], import_fun))
+        except Exception as e:
+            print(e)
+            errors[str(i)] = {
+                KEY_TYPE: type(e).__name__,
+                KEY_VALUE: str(e)
+            }
+
+    reqs = [item for item in items if is_dict(item, true)]  # types of classArgs and so on
+    errors.update(preload_classes(reqs, import_fun).get(KEY_ERROR_LIST))
+    return {
+        KEY_LIST: keys,
+        KEY_ERROR_LIST: errors
+    }
+
+
+def warmup(req=null, import_fun: callable = null, is_workers: bool = true) -> dict:
+    start_time = cur_time_in_millis()
+    update_ready(1)
+    try:
+        if is_str(req, true):
+            req = parse_json(req) if not_empty(req.strip()) else null
+
+        items = req.get(KEY_LIST) if is_dict(req, true) else req
+        items = config.WARMUP if items is None else items
+        assert is_list(items, true), KEY_LIST + ' must be list!'
+
+        pool = WORKER_POOL[0] if is_workers else null
+        future = null
+        if not_none(pool):  # methods are invoked in workers, warm them up at the same time, not ready until all done
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+            future = executor.submit(pool.invoke_all, 'warmup', items)
+            executor.shutdown(wait=false)
+
+        ret = warmup_items(items, import_fun)
+        res = {
+            KEY_LANGUAGE: LANGUAGE,
+            KEY_OK: true,
+            KEY_CODE: CODE_SUCCESS,
+            KEY_MSG: MSG_SUCCESS,
+            KEY_LIST: ret[KEY_LIST],
+            KEY_COUNT: size(ret[KEY_LIST]),
+            KEY_TIME_DETAIL: get_time_detail(start_time)
+        }
+        if not_empty(ret[KEY_ERROR_LIST]):
+            res[KEY_ERROR_LIST] = ret[KEY_ERROR_LIST]
+        if not_none(future):
+            res[KEY_WORKERS] = future.result()
+        return res
+    except Exception as e:
+        return wrap_error(e, start_time)
+    finally:
+        update_ready(-1)
+
+
+def start_warmup(items: list = null, import_fun: callable = null) -> threading.Thread:
+    update_ready(1)  # not ready from now on, instead of when the thread starts
+
+    def run():
+        try:
+            res = warmup(items, import_fun, is_workers=items is not None)  # workers warm up WARMUP by themselves
+            print('warmup ' + str(res.get(KEY_COUNT)) + ' methods in ' + str(res.get(KEY_TIME_DETAIL)))
+        finally:
+            update_ready(-1)
+
+    thd = threading.Thread(target=run, name='unitauto-warmup', daemon=true)
+    thd.start()
+    return thd
+
+
+RELOAD_MTIME_MAP = {}
+RELOAD_LOCK = threading.Lock()
+RELOAD_THREAD: list = [null]
+
+
+def get_reload_module_map(paths: list = null) -> dict:
+    paths = [os.path.abspath(p) for p in (paths or config.RELOAD_PATHS or [])]
+    if is_empty(paths):
+        return {}
+
+    mdl_map = {}
+    for name, module in list(sys.modules.items()):
+        file = getattr(module, '__file__', null)
+        if is_empty(file) or not file.endswith('.py'):
+            continue
+
+        file = os.path.abspath(file)
+        for p in paths:
+            if file == p or file.startswith(p + os.sep):
+                mdl_map[name] = file
+                break
+
+    return mdl_map
+
+
+def get_dependent_modules(names: list, mdl_map: dict) -> list:
+    dependents = {}
+    for name in mdl_map:
+        module = sys.modules.get(name)
+        if module is None:
+            continue
+
+        for v in list(vars(module).values()):
+            if type(v).__name__ == 'module':
+                dn = v.__name__
+                if dn.startswith(name + '.'):  # submodules are set as attributes of the package by import
                     continue
-                clazz = getattr(module, n)
+            else:
+                dn = getattr(v, '__module__', null)
+            if dn != name and is_str(dn, true) and dn in mdl_map:
+                dependents.setdefault(dn, set()).add(name)
 
-        CLASS_MAP[path] = clazz
+    result = list(names)
+    i = 0
+    while i < size(result):
+        for dn in sorted(dependents.get(result[i]) or []):
+            if dn not in result:
+                result.append(dn)
+        i += 1
 
-    return clazz
+    return result
+
+
+def evict_modules(names: list, files: list = null):
+    names = set(names)
+
+    def is_evict(obj) -> bool:
+        return getattr(obj, '__module__', null) in names
+
+    with CLASS_LOCK:
+        for k in [k for k, v in list(CLASS_MAP.items()) if is_evict(v)]:
+            CLASS_MAP.pop(k, null)
+
+    with CLASS_CACHE.lock:
+        for k in [k for k, v in CLASS_CACHE.items() if is_evict(v)]:
+            CLASS_CACHE.pop(k, null)
+
+    INSTANCE_MAP.evict(lambda e: is_evict(type(e.instance)))
+
+    with PLAN_MAP.lock:
+        for k in [k for k, v in PLAN_MAP.items() if getattr(v.module, '__name__', null) in names or is_evict(v.clazz)]:
+            del PLAN_MAP[k]
+
+    TYPE_STR_MAP.clear()
+    MODULE_PATH_MAP.clear()
+    CONVERTER_MAP.clear()
+
+    if not_empty(files):
+        with CATALOG_LOCK:
+            for catalog in CATALOG.values():
+                for f in files:
+                    catalog.pop(f, null)
+
+
+def check_reload(paths: list = null) -> list:
+    with RELOAD_LOCK:
+        mdl_map = get_reload_module_map(paths)
+
+        changed = []
+        for name, file in mdl_map.items():
+            stat = get_file_stat(file)
+            old = RELOAD_MTIME_MAP.get(file)
+            RELOAD_MTIME_MAP[file] = stat
+            if not_none(old) and old != stat:
+                changed.append(name)
+
+        if is_empty(changed):
+            return []
+
+        names = get_dependent_modules(sorted(changed), mdl_map)
+        evict_modules(names, [mdl_map[n] for n in names])
+
+        for name in names:
+            module = sys.modules.get(name)
+            if module is None:
+                continue
+            try:
+                importlib.reload(module)
+            except Exception as e:
+                print(e)
+
+        # requests served while reloading may have cached objects of the old modules again
+        evict_modules(names)
+        return names
+
+
+def start_reload(paths: list = null, interval: float = null) -> threading.Thread:
+    thd = RELOAD_THREAD[0]
+    if not_none(thd) and thd.is_alive():
+        return thd
+
+    check_reload(paths)  # remember current mtimes
+
+    def fun():
+        while RELOAD_THREAD[0] is thd:
+            time.sleep(interval or config.RELOAD_INTERVAL or 1)
+            try:
+                names = check_reload(paths)
+                if not_empty(names):
+                    print('reloaded ' + ', '.join(names))
+            except Exception as e:
+                print(e)
+
+    thd = threading.Thread(target=fun, name='unitauto-reload', daemon=true)
+    RELOAD_THREAD[0] = thd
+    thd.start()
+    return thd
+
+
+def stop_reload():
+    RELOAD_THREAD[0] = null
 
 
 def split(s: str, seperator: str = ',') -> list:
@@ -1300,6 +3011,14 @@ def is_instance(obj, typ):
     return isinstance(obj, typ)
 
 
+def is_picklable(obj) -> bool:
+    try:
+        pickle.dumps(obj)
+        return true
+    except Exception:
+        return false
+
+
 def is_name(s: str) -> bool:
     if is_empty(s) or PATTERN_NUMBER.match(s[:1]):
         return false
@@ -1347,10 +3066,158 @@ def get_time_detail(start_time: int, end_time: int = 0):
     return str(round(start_time)) + '|' + str(round(duration)) + '|' + str(round(end_time))
 
 
+def encode_str(obj, depth: int = 0):
+    return str(obj)
+
+
+def encode_primitive(obj, depth: int = 0):
+    return obj
+
+
+def encode_enum(obj, depth: int = 0):
+    return encode_value(obj.value, depth + 1)
+
+
+def encode_list(obj, depth: int = 0) -> list:
+    return [encode_value(v, depth + 1) for v in obj]
+
+
+def encode_dict(obj, depth: int = 0) -> dict:
+    d = {}
+    for k, v in obj.items():
+        if not (k is None or is_instance(k, (str, int, float, bool))):
+            k = str(k)
+        d[k] = encode_value(v, depth + 1)
+    return d
+
+
+def encode_dataclass(obj, depth: int = 0) -> dict:
+    return {f.name: encode_value(getattr(obj, f.name), depth + 1) for f in dataclasses.fields(obj)}
+
+
+def encode_slots(obj, depth: int = 0) -> dict:
+    d = {}
+    for c in type(obj).__mro__:
+        slots = c.__dict__.get('__slots__') or []
+        for n in [slots] if is_str(slots, true) else slots:
+            if n not in ('__dict__', '__weakref__') and n not in d and hasattr(obj, n):
+                d[n] = encode_value(getattr(obj, n), depth + 1)
+
+    if hasattr(obj, '__dict__'):
+        for k, v in encode_object(obj, depth).items():
+            d.setdefault(k, v)
+    return d
+
+
+def encode_object(obj, depth: int = 0):
+    d = getattr(obj, '__dict__', null)
+    if not is_dict(d, true):
+        return str(obj)
+    return encode_dict({k: v for k, v in d.items() if not k.startswith('_')}, depth)
+
+
+def encode_iterator(obj, depth: int = 0) -> list:
+    return [encode_value(v, depth + 1) for v in iterate(obj)]
+
+
+def encode_custom(obj, depth: int = 0):
+    try:
+        v = obj.encode(null)  # like testutil.Test.encode
+        return json.loads(v) if is_str(v, true) else encode_value(v, depth + 1)
+    except Exception as e:
+        print(e)
+    return encode_object(obj, depth)
+
+
+ENCODER_MAP = {  # class: encoder(obj) -> value that json supports, see register_encoder
+    type(None): encode_primitive,
+    bool: encode_primitive,
+    int: encode_primitive,
+    float: encode_primitive,
+    str: encode_primitive,
+    list: encode_list,
+    tuple: encode_list,
+    set: encode_list,
+    frozenset: encode_list,
+    dict: encode_dict,
+    enum.Enum: encode_enum,
+    complex: encode_str,
+    bytes: encode_str,
+    bytearray: encode_str,
+    type: encode_str,
+    types.FunctionType: encode_str,
+    types.MethodType: encode_str,
+    types.BuiltinFunctionType: encode_str,
+    types.ModuleType: encode_str,
+    io.IOBase: encode_str,
+    range: encode_iterator,
+}
+CLASS_ENCODER_MAP = {}  # resolved encoders of every encoded class, including subclasses of ENCODER_MAP
+CUSTOM_ENCODER_SET = set()
+
+
+def register_encoder(clazz: type, encoder: callable):
+    ENCODER_MAP[clazz] = encoder
+    CUSTOM_ENCODER_SET.add(encoder)
+    CLASS_ENCODER_MAP.clear()
+
+
+def get_encoder(clazz: type) -> callable:
+    encoder = CLASS_ENCODER_MAP.get(clazz)
+    if encoder is not None:
+        return encoder
+
+    for c in clazz.__mro__:
+        encoder = ENCODER_MAP.get(c)
+        if encoder is not None:
+            break
+
+    if encoder is None:
+        if dataclasses.is_dataclass(clazz):
+            encoder = encode_dataclass
+        elif callable(getattr(clazz, 'encode', null)) and clazz.__module__ != 'builtins':
+            encoder = encode_custom
+        elif issubclass(clazz, collections.abc.Iterator):  # generator, map, zip... consumed once, up to ITERATOR_LIMIT
+            encoder = encode_iterator
+        elif any('__slots__' in c.__dict__ for c in clazz.__mro__[:-1]):
+            encoder = encode_slots
+        else:
+            encoder = encode_object
+
+    CLASS_ENCODER_MAP[clazz] = encoder
+    return encoder
+
+
+ENCODE_LOCAL = threading.local()
+
+
+def encode_value(obj, depth: int = 0):
+    t = type(obj)
+    if obj is None or t in (str, int, float, bool):
+        return obj
+
+    ids = getattr(ENCODE_LOCAL, 'ids', null)
+    if ids is None:
+        ids = ENCODE_LOCAL.ids = set()
+
+    i = id(obj)
+    if depth > config.ENCODE_DEPTH or i in ids:  # too deep or circular reference
+        return str(obj)
+
+    ids.add(i)
+    try:
+        encoder = get_encoder(t)
+        if encoder in CUSTOM_ENCODER_SET:  # registered by users, only accept obj
+            return encode_value(encoder(obj), depth + 1)
+        return encoder(obj, depth)
+    finally:
+        ids.discard(i)
+
+
 def parse_json(s: str):
     return json.loads(s)
 
 
-def to_json_str(obj, indent: int = 2) -> str:
-    return json.dumps(obj, ensure_ascii=false, indent=indent)
+def to_json_str(obj, indent: int = null) -> str:
+    return json.dumps(obj, ensure_ascii=false, indent=indent, default=encode_value)
 
@@ -21,18 +21,26 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import time
+
+START_TIME = time.perf_counter()  # before other imports, for the import step of STARTUP_MAP
+
+import asyncio
+import hashlib
 import json
-import coverage
+import mimetypes
 
 from unitauto import methodutil
 from unitauto.methodutil import null, true, false, to_json_str, list_method, invoke_method, KEY_PACKAGE, KEY_CLASS, \
     KEY_CONSTRUCTOR, KEY_CLASS_ARGS, KEY_THIS, KEY_METHOD, KEY_METHOD_ARGS, KEY_TYPE, KEY_VALUE, KEY_RETURN, KEY_KEY, \
-    KEY_ASYNC, KEY_CALLBACK
+    KEY_ASYNC, KEY_CALLBACK, KEY_TIMEOUT, KEY_LIMIT, invoke_batch
 
 import http.server
 from http.server import HTTPServer, BaseHTTPRequestHandler, SimpleHTTPRequestHandler
+from concurrent.futures import ThreadPoolExecutor
 from functools import partial
 import os
+import threading
 
 
 CHARSET = 'uft-8'
@@ -41,29 +49,330 @@ HOST = ('localhost', 8083)
 RESPONSE_CODE_SUCCESS = 200
 KEY_CONTENT_TYPE = 'Content-Type'
 KEY_CONTENT_LENGTH = 'Content-Length'
+KEY_TRANSFER_ENCODING = 'Transfer-Encoding'
 CONTENT_TYPE = 'application/json; charset=UTF-8'
+CONTENT_TYPE_NDJSON = 'application/x-ndjson; charset=UTF-8'
+
+
+COVERAGE = [null]  # created on the first /coverage/* request, see get_coverage
+COVERAGE_LOCK = threading.Lock()
+
+STARTUP_MAP = {  # milliseconds spent on every step of start and start_async
+    'import': round((time.perf_counter() - START_TIME) * 1000, 1)
+}
+
+
+def get_coverage():
+    cov = COVERAGE[0]
+    if cov is None:
+        with COVERAGE_LOCK:
+            cov = COVERAGE[0]
+            if cov is None:
+                import coverage  # slow, and not needed by deployments that never call /coverage/*
+                cov = coverage.coverage()
+                COVERAGE[0] = cov
+
+    return cov
+
+
+def record_startup(name: str, start: float) -> float:
+    now = time.perf_counter()
+    STARTUP_MAP[name] = round((now - start) * 1000, 1)
+    return now
+
+
+def print_startup():
+    print('startup: ' + ', '.join(k + ' ' + str(v) + 'ms' for k, v in STARTUP_MAP.items()))
+
+
+def prepare():
+    t = time.perf_counter()
+    # fork workers before any thread starts, a child forked while another thread holds a lock may deadlock
+    if methodutil.not_none(methodutil.get_worker_pool()):
+        t = record_startup('workers', t)
+
+    if methodutil.not_empty(methodutil.config.RELOAD_PATHS):
+        methodutil.start_reload()
+        t = record_startup('reload', t)
+
+    if methodutil.not_empty(methodutil.config.WARMUP):
+        thd = methodutil.start_warmup()  # /method/ready responds 503 until it is done
+
+        def wait(start=t):
+            thd.join()
+            record_startup('warmup', start)
+            print_startup()
+
+        threading.Thread(target=wait, name='unitauto-startup', daemon=true).start()
+
+
+def get_headers(origin, method='POST', content_type: str = CONTENT_TYPE) -> list:
+    headers = []
+    if methodutil.not_empty(content_type):
+        headers.append((KEY_CONTENT_TYPE, content_type))
+    headers.append(('Access-Control-Allow-Origin', origin))
+    headers.append(('Access-Control-Allow-Credentials', 'true'))
+    headers.append(('Access-Control-Allow-Headers', 'Content-Type,content-type'))
+    headers.append(('Access-Control-Allow-Methods', 'POST,GET,OPTIONS'))
+    headers.append(('Access-Control-Request-Method', method))
+    return headers
+
+
+def get_timeout_result(timeout: int, start_time: int) -> dict:
+    return {
+        methodutil.KEY_LANGUAGE: methodutil.LANGUAGE,
+        methodutil.KEY_OK: false,
+        methodutil.KEY_CODE: methodutil.CODE_SERVER_ERROR,
+        methodutil.KEY_MSG: 'callback is not called in ' + KEY_TIMEOUT + ': ' + str(timeout) + 'ms!',
+        methodutil.KEY_TIME_DETAIL: methodutil.get_time_detail(start_time),
+        methodutil.KEY_THROW: TimeoutError.__name__
+    }
+
+
+def get_timeout(req) -> float:
+    timeout = req.get(KEY_TIMEOUT) if methodutil.is_dict(req, true) else null
+    return timeout / 1000 if methodutil.is_int(timeout, true) and timeout > 0 else null
+
+
+def get_limit(req) -> int:
+    limit = req.get(KEY_LIMIT) if methodutil.is_dict(req, true) else null
+    return limit if methodutil.is_int(limit, true) and not methodutil.is_bool(limit, true) else null
+
 
+def get_ready_result() -> list:
+    ready = methodutil.is_ready()  # including workers, which serve /method/invoke if there are
+    code = RESPONSE_CODE_SUCCESS if ready else 503
+    res = {
+        methodutil.KEY_LANGUAGE: methodutil.LANGUAGE,
+        methodutil.KEY_OK: ready,
+        methodutil.KEY_CODE: code,
+        methodutil.KEY_MSG: methodutil.MSG_SUCCESS if ready else 'warming up',
+        'ready': ready,
+        'startup': STARTUP_MAP
+    }
+
+    workers = methodutil.get_ready_workers()
+    if workers is not None:
+        res[methodutil.KEY_WORKERS] = workers
+    return [code, res]
+
+
+class CoverageReport:
+    def __init__(self):
+        self.lock = threading.RLock()  # coverage is not thread safe, every call of it holds this lock
+        self.state_lock = threading.Lock()  # only for the fields below, never held while coverage runs
+        self.version = 0  # +1 by /coverage/start, stop and save
+        self.running = false
+        self.cache = null  # [key, etag, res_str] of the last rendered report
+        self.thread = null
+
+    def get_key(self, cov) -> tuple:  # call with state_lock
+        try:
+            stat = os.stat(cov.config.data_file)  # also changed by other processes, like coverage combine
+            data = (stat.st_mtime_ns, stat.st_size)
+        except Exception:
+            data = null
+
+        tick = null
+        if self.running:  # collected data keeps changing, reuse the report for a while instead of comparing data
+            interval = methodutil.config.COVERAGE_REPORT_INTERVAL or 0
+            tick = int(time.time() // interval) if interval > 0 else time.time_ns()
+        return self.version, data, tick
+
+    def start(self):
+        with self.lock:
+            cov = get_coverage()
+            try:
+                cov.stop()
+            except Exception as e:
+                print(e)
+
+            cov.start()
+
+        with self.state_lock:
+            self.running = true
+            self.version += 1
+
+    def stop(self):
+        with self.lock:
+            get_coverage().stop()
+
+        with self.state_lock:
+            self.running = false
+            self.version += 1
+
+    def save(self):
+        with self.lock:
+            get_coverage().save()
+
+        with self.state_lock:
+            self.version += 1
+
+    def get_cache(self, key: tuple) -> list:
+        with self.state_lock:
+            cache = self.cache
+        return cache if cache is not None and cache[0] == key else null
+
+    def render(self) -> list:
+        cov = get_coverage()
+        with self.state_lock:
+            key = self.get_key(cov)
+
+        cache = self.get_cache(key)
+        if cache is not None:
+            return cache
+
+        res = {
+            methodutil.KEY_CODE: methodutil.CODE_SUCCESS,
+            methodutil.KEY_MSG: methodutil.MSG_SUCCESS,
+            'url': '/htmlcov/index.html'
+        }
+        with self.lock:
+            cache = self.get_cache(key)  # rendered by another thread while waiting for the lock
+            if cache is not None:
+                return cache
+
+            res['coverage'] = cov.report()
+            try:
+                cov.json_report()
+                with open('coverage.json', 'r') as f:
+                    t = f.read()
+                try:
+                    res['json'] = json.loads(t)
+                except Exception as e:
+                    print(e)
+                    res['json'] = t
+            except Exception as e:
+                print(e)
 
-COVERAGE = coverage.coverage()
+            try:
+                cov.html_report()  # only changed files are rendered again, see status.json in html_dir
+                with open(os.path.join(self.get_html_dir(), 'index.html'), 'r') as f:
+                    res['html'] = f.read()
+            except Exception as e:
+                print(e)
+
+        res_str = to_json_str(res)
+        etag = '"' + hashlib.sha1(res_str.encode()).hexdigest() + '"'
+        cache = [key, etag, res_str]
+        with self.state_lock:
+            self.cache = cache
+        return cache
+
+    def get(self) -> list:
+        cov = get_coverage()
+        with self.state_lock:
+            cache = self.cache
+            if cache is not None and cache[0] != self.get_key(cov) \
+                    and (self.thread is None or not self.thread.is_alive()):
+                # serve the last report right now, and render the new one in background for the next request
+                self.thread = threading.Thread(target=self.render, name='unitauto-coverage', daemon=true)
+                self.thread.start()
+
+        return self.render() if cache is None else cache
+
+    def get_html_dir(self) -> str:
+        return getattr(get_coverage().config, 'html_dir', null) or 'htmlcov'
+
+
+COVERAGE_REPORT = CoverageReport()
+
+
+def handle_coverage(path: str, host: str, etag: str = null) -> list:
+    res = {
+        methodutil.KEY_CODE: methodutil.CODE_SUCCESS,
+        methodutil.KEY_MSG: methodutil.MSG_SUCCESS
+    }
+    res_str = to_json_str(res)
+
+    if path == '/coverage/start':
+        COVERAGE_REPORT.start()
+    elif path == '/coverage/stop':
+        COVERAGE_REPORT.stop()
+    elif path == '/coverage/save':
+        COVERAGE_REPORT.save()
+    elif path == '/coverage/report':
+        key, tag, res_str = COVERAGE_REPORT.get()
+        if etag == tag:
+            return [304, CONTENT_TYPE, '', {'ETag': tag}]
+        return [RESPONSE_CODE_SUCCESS, CONTENT_TYPE, res_str, {'ETag': tag}]
+    elif path == '/coverage/index.html':
+        return [301, CONTENT_TYPE, res_str, {'Location': host + '/unitauto-py/htmlcov/index.html'}]
+    else:
+        key, tag, _ = COVERAGE_REPORT.get()  # files of html_dir are rendered together with the report
+
+        name = path[len('/coverage/'):]
+        html_dir = os.path.abspath(COVERAGE_REPORT.get_html_dir())
+        file = os.path.abspath(os.path.join(html_dir, name))
+        if not (file.startswith(html_dir + os.sep) and os.path.isfile(file)):
+            return [404, CONTENT_TYPE, res_str, {}]
+
+        tag = '"' + hashlib.sha1((tag + name).encode()).hexdigest() + '"'
+        if etag == tag:
+            return [304, 'text/html', '', {'ETag': tag}]
+
+        with open(file, 'r') as f:
+            res_str = f.read()
+        return [RESPONSE_CODE_SUCCESS, mimetypes.guess_type(name)[0] or 'text/html', res_str, {'ETag': tag}]
+
+    return [RESPONSE_CODE_SUCCESS, CONTENT_TYPE, res_str, {}]
+
+
+class Server(http.server.ThreadingHTTPServer):
+    def server_bind(self):
+        start = time.perf_counter()
+        super().server_bind()
+        record_startup('bind', start)
+
+    def server_activate(self):
+        super().server_activate()
+        record_startup('total', START_TIME)
+        print_startup()
 
 
 class Request(SimpleHTTPRequestHandler):
-    timeout = 5
+    timeout = 5  # seconds for an idle keep-alive connection to wait for the next request
     server_version = "Apache"
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = true  # headers and body are written separately, don't wait for delayed ACK
 
-    def send_headers(self, origin, method='POST', content_type: str = CONTENT_TYPE):
-        if methodutil.not_empty(content_type):
-            self.send_header(KEY_CONTENT_TYPE, content_type)
-        self.send_header('Access-Control-Allow-Origin', origin)
-        self.send_header('Access-Control-Allow-Credentials', 'true')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type,content-type')
-        self.send_header('Access-Control-Allow-Methods', 'POST,GET,OPTIONS')
-        self.send_header('Access-Control-Request-Method', method)
+    def send_headers(self, origin, method='POST', content_type: str = CONTENT_TYPE, content_length: int = null):
+        for k, v in get_headers(origin, method, content_type):
+            self.send_header(k, v)
+        if content_length is not None:
+            self.send_header(KEY_CONTENT_LENGTH, str(content_length))
 
         self.end_headers()
 
+    def write_chunk(self, data: bytes):
+        self.wfile.write(('%X' % len(data)).encode() + b'\r\n' + data + b'\r\n')
+        self.wfile.flush()
+
+    def list_method_stream(self, req: dict, origin, method='POST'):
+        self.send_response(RESPONSE_CODE_SUCCESS)
+        self.send_header(KEY_TRANSFER_ENCODING, 'chunked')
+        self.send_headers(origin, method, content_type=CONTENT_TYPE_NDJSON)
+
+        def item_callback(item):
+            self.write_chunk((to_json_str(item, indent=null) + '\n').encode())
+
+        rsp = list_method(req, item_callback=item_callback)
+        self.write_chunk((to_json_str(rsp, indent=null) + '\n').encode())
+        self.wfile.write(b'0\r\n\r\n')
+        self.wfile.flush()
+
+    def write_stream(self, lines, origin, method='POST'):
+        self.send_response(RESPONSE_CODE_SUCCESS)
+        self.send_header(KEY_TRANSFER_ENCODING, 'chunked')
+        self.send_headers(origin, method, content_type=CONTENT_TYPE_NDJSON)
+
+        for line in lines:
+            self.write_chunk(line.encode())
+        self.wfile.write(b'0\r\n\r\n')
+        self.wfile.flush()
+
     def do_GET(self):
-        if self.path.startswith('/coverage/'):
+        if self.path.startswith('/coverage/') or self.path == '/method/ready':
             self.do_POST()
             return
 
@@ -85,7 +394,7 @@ class Request(SimpleHTTPRequestHandler):
 
         if method == 'OPTIONS':
             self.send_response(RESPONSE_CODE_SUCCESS)
-            self.send_headers(origin, method)
+            self.send_headers(origin, method, content_length=0)
             # self.wfile.write('ok'.encode())
             return
 
@@ -97,108 +406,302 @@ class Request(SimpleHTTPRequestHandler):
         wfile = self.wfile
 
         if path.startswith('/coverage/'):
-            res = {
-                methodutil.KEY_CODE: methodutil.CODE_SUCCESS,
-                methodutil.KEY_MSG: methodutil.MSG_SUCCESS
-            }
-            res_str = to_json_str(res)
-
-            if path == '/coverage/start':
-                try:
-                    COVERAGE.stop()
-                except Exception as e:
-                    print(e)
-
-                COVERAGE.start()
-            elif path == '/coverage/stop':
-                COVERAGE.stop()
-            elif path == '/coverage/save':
-                COVERAGE.save()
-            else:
-                if path == '/coverage/report':
-                    res['coverage'] = COVERAGE.report()
-                    res['url'] = '/htmlcov/index.html'
-                    try:
-                        COVERAGE.json_report()
-                        f = open('coverage.json', 'r')
-                        t = f.read()
-                        try:
-                            res['json'] = json.loads(t)
-                        except Exception as e:
-                            print(e)
-                            res['json'] = t
-                    except Exception as e:
-                        print(e)
-
-                    try:
-                        COVERAGE.html_report()
-                        f = open('htmlcov/index.html', 'r')
-                        res['html'] = f.read()
-                        # res['html'] = '../htmlcov/index.html'  # f.read()
-                    except Exception as e:
-                        print(e)
-
-                    res_str = to_json_str(res)
-                elif path == '/coverage/index.html':
-                    self.send_response(301)
-                    self.send_header('Location', host + '/unitauto-py/htmlcov/index.html')
-                else:
-                    COVERAGE.html_report()
-
-                    ind = methodutil.index(path, '/')
-                    f = open('../htmlcov/' + path[ind+1:], 'r')
-                    res_str = f.read()
-                    self.send_headers(origin, method, content_type='text/html')
-                    wfile.write(res_str.encode())
-                    return
+            code, content_type, res_str, headers = handle_coverage(path, host, self.headers.get('If-None-Match'))
+            res_byte = res_str.encode()
+            self.send_response(code)
+            for k in headers:
+                self.send_header(k, headers[k])
+            self.send_headers(origin, method, content_type=content_type, content_length=len(res_byte))
+            wfile.write(res_byte)
+            return
 
-            self.send_response(RESPONSE_CODE_SUCCESS)
-            self.send_headers(origin, method)
-            wfile.write(res_str.encode())
+        if path == '/method/ready':
+            code, res = get_ready_result()
+            res_byte = to_json_str(res).encode()
+            self.send_response(code)
+            self.send_headers(origin, method, content_length=len(res_byte))
+            wfile.write(res_byte)
             return
 
-        done = [false]
+        done = threading.Event()
+        lock = threading.Lock()
 
         def callback(res):
-            res_str = to_json_str(res)
-            res_byte = res_str.encode()
-            self.send_response(RESPONSE_CODE_SUCCESS)
-            self.send_headers(origin, method)
-            if done[0] or wfile is None or wfile.closed:
-                return
+            with lock:
+                if done.is_set() or wfile is None or wfile.closed:
+                    return
 
-            wfile.write(res_byte)
-            done[0] = true
-            try:
-                wfile.close()
-            except BaseException as e:
-                # print(e)
-                pass
-            # cause error 'unresolved reference'  wfile = null
+                if methodutil.is_iterator(res.get(KEY_RETURN)):  # requested with "stream": true
+                    self.write_stream(methodutil.stream_result(res, get_limit(req), get_timeout(req)), origin, method)
+                    done.set()
+                    return
+
+                res_str = to_json_str(res)
+                res_byte = res_str.encode()
+                self.send_response(RESPONSE_CODE_SUCCESS)
+                self.send_headers(origin, method, content_length=len(res_byte))
+                wfile.write(res_byte)
+                wfile.flush()  # keep the connection open for the next request
+                done.set()
 
         if path == '/method/list':
+            try:
+                req = methodutil.parse_json(req)
+            except Exception as e:
+                print(e)
+
+            if methodutil.is_dict(req, true) and req.get(methodutil.KEY_STREAM) is true:
+                self.list_method_stream(req, origin, method)
+                return
+
             rsp = list_method(req)
             callback(rsp)
+        elif path == '/method/invoke/batch':
+            callback(invoke_batch(req))
+        elif path == '/method/warmup':
+            callback(methodutil.warmup(req))
+        elif path == '/instance/list':
+            callback(methodutil.list_instance(req))
+        elif path == '/instance/evict':
+            callback(methodutil.evict_instance(req))
         elif path == '/method/invoke':
+            start_time = methodutil.cur_time_in_millis()
+            try:
+                req = methodutil.parse_json(req)
+            except Exception as e:
+                print(e)
+
+            timeout = get_timeout(req)
+            pool = methodutil.get_worker_pool()
+            if pool is not None:
+                callback(pool.invoke(req, timeout))
+                return
+
             invoke_method(req, callback)
-            while true:
-                if done[0]:
-                    break
+            if not done.wait(timeout):
+                callback(get_timeout_result(req.get(KEY_TIMEOUT), start_time))
+        else:
+            self.send_error(404)
 
 
-def start(host=HOST):
+def start(host=HOST, timeout: float = null):
     wk_dir = os.getcwd()
+    if timeout is not None:
+        Request.timeout = timeout
+
     Request.extensions_map = {
         k: v + ';charset=UTF-8' for k, v in Request.extensions_map.items()
     }
 
+    prepare()
+
     # server = HTTPServer(host, Request)
     # # print("Starting server, listen at: %s:%s" % host)
     # server.serve_forever()
     # server.server_bind()
     # print('http://localhost:8083/')
 
-    http.server.test(Request, port=host[1])  # HandlerClass=partial(SimpleHTTPRequestHandler, directory=wk_dir + '/htmlcov'), port=8083, bind='')
+    http.server.test(Request, Server, port=host[1], protocol=Request.protocol_version)  # HandlerClass=partial(SimpleHTTPRequestHandler, directory=wk_dir + '/htmlcov'), port=8083, bind='')
+
+
+async def write_response(
+    writer: asyncio.StreamWriter, code: int, body: bytes, origin, method='POST',
+    content_type: str = CONTENT_TYPE, headers: dict = null, keep_alive: bool = true
+):
+    lines = ['HTTP/1.1 ' + str(code) + ' ' + http.HTTPStatus(code).phrase, 'Server: ' + Request.server_version]
+    for k in headers or {}:
+        lines.append(k + ': ' + str(headers[k]))
+    for k, v in get_headers(origin, method, content_type):
+        lines.append(k + ': ' + v)
+    lines.append(KEY_CONTENT_LENGTH + ': ' + str(len(body)))
+    lines.append('Connection: ' + ('keep-alive' if keep_alive else 'close'))
+
+    writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+    await writer.drain()
+
+
+def write_stream_headers(writer: asyncio.StreamWriter, origin, method='POST'):
+    lines = ['HTTP/1.1 200 OK', 'Server: ' + Request.server_version, KEY_TRANSFER_ENCODING + ': chunked']
+    for k, v in get_headers(origin, method, CONTENT_TYPE_NDJSON):
+        lines.append(k + ': ' + v)
+    lines.append('Connection: close')
+    writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+
+
+def write_chunk(writer: asyncio.StreamWriter, data: bytes):
+    writer.write(('%X' % len(data)).encode() + b'\r\n' + data + b'\r\n')
+
+
+async def write_stream_async(writer: asyncio.StreamWriter, lines, origin, method='POST', executor=null):
+    loop = asyncio.get_running_loop()
+    write_stream_headers(writer, origin, method)
+
+    while true:  # items may take long to be generated, so pull them in executor
+        line = await loop.run_in_executor(executor, next, lines, null)
+        if line is None:
+            break
+        write_chunk(writer, line.encode())
+        await writer.drain()
+
+    writer.write(b'0\r\n\r\n')
+    await writer.drain()
+
+
+async def list_method_stream_async(writer: asyncio.StreamWriter, req: dict, origin, method='POST', executor=null):
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+
+    def item_callback(item):
+        loop.call_soon_threadsafe(queue.put_nowait, item)
+
+    def fun():
+        try:
+            return list_method(req, item_callback=item_callback)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, null)
+
+    write_stream_headers(writer, origin, method)
+
+    future = loop.run_in_executor(executor, fun)
+    while true:
+        item = await queue.get()
+        if item is None:
+            break
+        write_chunk(writer, (to_json_str(item, indent=null) + '\n').encode())
+        await writer.drain()
+
+    write_chunk(writer, (to_json_str(await future, indent=null) + '\n').encode())
+    writer.write(b'0\r\n\r\n')
+    await writer.drain()
+
+
+async def handle_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, executor=null):
+    loop = asyncio.get_running_loop()
+    client_address = writer.get_extra_info('peername') or ('', 0)
+    host = 'http://' + str(client_address[0]) + ':' + str(client_address[1])
+
+    try:
+        while true:
+            try:
+                line = await asyncio.wait_for(reader.readline(), Request.timeout)
+            except asyncio.TimeoutError:
+                break  # idle keep-alive connection
+            if not line:
+                break
+
+            words = line.decode('latin-1').split()
+            if methodutil.size(words) != 3:
+                break
+
+            method, path, version = words
+            headers = {}
+            while true:
+                h = await reader.readline()
+                if h in (b'\r\n', b'\n', b''):
+                    break
+                k, _, v = h.decode('latin-1').partition(':')
+                headers[k.strip().lower()] = v.strip()
+
+            cl = headers.get(KEY_CONTENT_LENGTH.lower())
+            bs = await reader.readexactly(int(cl)) if methodutil.not_empty(cl) else b''
+            req = bs.decode()
+            print(method + ' ' + host + path)
+
+            origin = headers.get('origin') or 'http://apijson.cn'
+            keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+
+            if method == 'OPTIONS':
+                await write_response(writer, RESPONSE_CODE_SUCCESS, b'', origin, method, keep_alive=keep_alive)
+                continue
+
+            if path.startswith('/coverage/'):
+                code, content_type, res_str, hs = await loop.run_in_executor(
+                    executor, handle_coverage, path, host, headers.get('if-none-match')
+                )
+                await write_response(writer, code, res_str.encode(), origin, method, content_type, hs, keep_alive)
+                continue
+
+            if path == '/method/ready':
+                code, rsp = get_ready_result()
+                await write_response(writer, code, to_json_str(rsp).encode(), origin, method, keep_alive=keep_alive)
+                continue
+
+            if method != 'POST' or path not in (
+                '/method/list', '/method/invoke', '/method/invoke/batch', '/method/warmup',
+                '/instance/list', '/instance/evict'
+            ):
+                await write_response(writer, 404, b'', origin, method, keep_alive=keep_alive)
+                continue
+
+            try:
+                req = methodutil.parse_json(req)
+            except Exception as e:
+                print(e)
+
+            if path == '/method/list':
+                if methodutil.is_dict(req, true) and req.get(methodutil.KEY_STREAM) is true:
+                    await list_method_stream_async(writer, req, origin, method, executor)
+                    break
+
+                rsp = await loop.run_in_executor(executor, list_method, req)
+            elif path == '/method/invoke/batch':
+                rsp = await loop.run_in_executor(executor, invoke_batch, req)
+            elif path == '/method/warmup':
+                rsp = await loop.run_in_executor(executor, methodutil.warmup, req)
+            elif path == '/instance/list':  # waits for workers, if there are
+                rsp = await loop.run_in_executor(executor, methodutil.list_instance, req)
+            elif path == '/instance/evict':
+                rsp = await loop.run_in_executor(executor, methodutil.evict_instance, req)
+            elif methodutil.get_worker_pool() is not None:
+                rsp = await loop.run_in_executor(executor, methodutil.get_worker_pool().invoke, req, get_timeout(req))
+            else:
+                start_time = methodutil.cur_time_in_millis()
+                future = loop.create_future()
+
+                def callback(res, future=future):
+                    loop.call_soon_threadsafe(lambda: future.done() or future.set_result(res))
+
+                # sync methods run in executor, coroutines are awaited in this loop instead of asyncio.run
+                await loop.run_in_executor(executor, partial(invoke_method, req, callback, loop=loop, executor=executor))
+                try:
+                    rsp = await asyncio.wait_for(future, get_timeout(req))
+                except asyncio.TimeoutError:
+                    rsp = get_timeout_result(req.get(KEY_TIMEOUT), start_time)
+
+                if methodutil.is_dict(rsp, true) and methodutil.is_iterator(rsp.get(KEY_RETURN)):  # "stream": true
+                    lines = methodutil.stream_result(rsp, get_limit(req), get_timeout(req))
+                    await write_stream_async(writer, lines, origin, method, executor)
+                    break
+
+            await write_response(writer, RESPONSE_CODE_SUCCESS, to_json_str(rsp).encode(), origin, method, keep_alive=keep_alive)
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError) as e:
+        print(e)
+    finally:
+        writer.close()
+
+
+def start_async(host=HOST, workers: int = null):
+    prepare()
+
+    async def serve():
+        executor = ThreadPoolExecutor(max_workers=workers)
+        start = time.perf_counter()
+        server = await asyncio.start_server(
+            lambda reader, writer: handle_connection(reader, writer, executor), host[0], host[1]
+        )
+        record_startup('bind', start)
+        record_startup('total', START_TIME)
+        print_startup()
+        print('Serving HTTP on ' + str(host[0]) + ' port ' + str(host[1]) + ' (http://' + str(host[0]) + ':' + str(host[1]) + '/) ...')
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        print('\nKeyboard interrupt received, exiting.')
 
 
 def test():